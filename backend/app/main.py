@@ -1,6 +1,6 @@
 import os
 import asyncio
-import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -21,11 +21,42 @@ from . import models  # noqa: F401 - ensure models are registered in metadata
 from .routers import slack_test as slack_test_router
 from .routers import whatsapp_test as whatsapp_test_router
 from .routers import whatsapp_webhook as whatsapp_webhook_router
+from .routers import fivec_webhook as fivec_webhook_router
+from .routers import events as events_router
+from .utils.status_queue import record_check_result
+from .utils.leader import run_as_leader
+from .utils.report_batcher import report_details
+from .utils import fivec_client
+from .utils.fivec_client import API_BASE
+from .utils.fivec_gateway import gateway as fivec_gateway, upload_gateway as fivec_upload_gateway
+from .utils import study_cache
+from .utils import report_jobs
+from .utils import events, viewer_links
+from .utils.pdf_cache import pdf_cache
 
 
 load_dotenv()
 
-app = FastAPI(title="Second Opinion API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared 5C client first so background loops and requests reuse its connection pool
+    await fivec_client.startup()
+    # Relay change events committed by other processes to this process's SSE clients
+    events.listener.start()
+    _start_status_task()
+    # Every process runs a report-job pool; jobs are claimed with SKIP LOCKED leases
+    job_workers = report_jobs.start_workers()
+    try:
+        yield
+    finally:
+        await report_jobs.stop_workers(job_workers)
+        await _stop_status_task()
+        await events.listener.stop()
+        await fivec_client.shutdown()
+
+
+app = FastAPI(title="Second Opinion API", lifespan=lifespan)
 
 
 # CORS configuration - allow common local dev ports and external access
@@ -75,97 +106,200 @@ app.include_router(cases_router.router)
 app.include_router(slack_test_router.router)
 app.include_router(whatsapp_test_router.router)
 app.include_router(whatsapp_webhook_router.router)
+app.include_router(fivec_webhook_router.router)
+app.include_router(events_router.router)
 app.include_router(storage_router.router)
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    gateway_state = fivec_gateway.snapshot()
+    upload_state = fivec_upload_gateway.snapshot()
+    circuits = (gateway_state["circuit"]["state"], upload_state["circuit"]["state"])
+    return {
+        # Degraded while 5C calls are being short-circuited
+        "status": "degraded" if any(state != "closed" for state in circuits) else "ok",
+        "fivec_http": fivec_client.pool_stats(),
+        "fivec_gateway": gateway_state,
+        "fivec_upload_gateway": upload_state,
+        "study_cache": study_cache.stats(),
+        "report_polls": report_jobs.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "viewer_links": viewer_links.stats(),
+    }
 
 
 # ---------------- Background status refresher ----------------
-API_BASE = os.getenv("FIVEC_API_BASE", "https://api.5cnetwork.com")
-API_AUTH = os.getenv("FIVEC_API_AUTH")
 STATUS_REFRESH_INTERVAL = int(os.getenv("STATUS_REFRESH_INTERVAL_SECONDS", "300"))
+# Max number of files checked against 5C at the same time
+STATUS_REFRESH_CONCURRENCY = int(os.getenv("STATUS_REFRESH_CONCURRENCY", "16"))
+# Due files are streamed from the queue in chunks of this size, with a commit per chunk
+STATUS_REFRESH_CHUNK_SIZE = int(os.getenv("STATUS_REFRESH_CHUNK_SIZE", "200"))
+# Checks still in flight after this many seconds are cancelled and retried next cycle
+STATUS_REFRESH_DEADLINE = int(os.getenv("STATUS_REFRESH_DEADLINE_SECONDS", str(max(STATUS_REFRESH_INTERVAL - 30, 30))))
 
 _status_task: asyncio.Task | None = None
 
 
-async def _get_json(client: httpx.AsyncClient, url: str, params: dict | None = None):
-    headers = {}
-    if API_AUTH:
-        headers["Authorization"] = API_AUTH
-    r = await client.get(url, params=params, headers=headers)
-    if r.headers.get("content-type", "").startswith("application/json"):
+async def _check_file_status(
+    sem: asyncio.Semaphore,
+    study_iuid: str | None,
+    study_id: str | None,
+    status: str | None,
+) -> tuple[str | None, str | None]:
+    """Query 5C for a single file and return its (study_id, status). Does not touch the DB."""
+    async with sem:
+        # Ensure we have a study_id
+        if not study_id and study_iuid:
+            study_id = await study_cache.resolve_study_id(study_iuid)
+
+        # Decide status if we have a study_id and not completed
+        if study_id and status != "completed":
+            code, _ = await fivec_client.get_json(f"{API_BASE}/report/client/completed/{study_id}")
+            if code == 200:
+                status = "completed"
+            else:
+                # Details fallback, coalesced with other files' lookups into multi-id requests
+                details = await report_details.load(study_id)
+                if details is not None:
+                    status = "completed"
+                else:
+                    status = status or "processing"
+    return study_id, status
+
+
+def _apply_status_results(results: dict[int, tuple[str | None, str | None] | None]) -> None:
+    """Persist one chunk of check results in its own short transaction.
+
+    `results` maps file id -> (study_id, status), or None when the vendor check failed.
+    """
+    from sqlalchemy import select
+    db = SessionLocal()
+    try:
+        checks = {
+            c.file_id: c
+            for c in db.execute(
+                select(_models.StatusCheck).where(_models.StatusCheck.file_id.in_(list(results)))
+            ).scalars()
+        }
+        files = {
+            f.id: f
+            for f in db.execute(
+                select(_models.File).where(_models.File.id.in_(list(results)))
+            ).scalars()
+        }
+        for file_id, result in results.items():
+            check, f = checks.get(file_id), files.get(file_id)
+            if check is None or f is None:
+                continue
+            if result is None:
+                record_check_result(db, check, check.last_vendor_status)
+                continue
+            previous_status = f.status
+            f.study_id, f.status = result
+            record_check_result(db, check, f.status)
+            if f.status != previous_status:
+                events.emit_file_status(db, f)
+            if f.status == "completed" and previous_status != "completed":
+                # Status flipped without a stored PDF (e.g. a missed webhook): fetch the report
+                report_jobs.enqueue_report_poll(db, f.id)
+            # If any file has completed, mark its case completed
+            if f.status == "completed" and f.case_id:
+                case = db.get(_models.Case, f.case_id)
+                if case and case.status != "completed":
+                    case.status = "completed"
+                    db.add(case)
+                    events.emit_case_status(db, case, user_id=f.user_id)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _refresh_pending_files_once() -> None:
+    """One refresher cycle: walk due checks in keyset-paginated chunks, committing per chunk."""
+    from sqlalchemy import select, func
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_REFRESH_DEADLINE
+    sem = asyncio.Semaphore(max(STATUS_REFRESH_CONCURRENCY, 1))
+    last_file_id = 0
+    checked = 0
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            print(f"[status_refresher] deadline hit after {checked} files; resuming next cycle")
+            return
+
+        # Snapshot the next chunk of due files; the session is closed before any vendor call
+        db = SessionLocal()
         try:
-            return r.status_code, r.json()
-        except Exception:
-            return r.status_code, None
-    return r.status_code, None
+            rows = db.execute(
+                select(
+                    _models.StatusCheck.file_id,
+                    _models.File.study_iuid,
+                    _models.File.study_id,
+                    _models.File.status,
+                )
+                .join(_models.File, _models.File.id == _models.StatusCheck.file_id)
+                .where(_models.StatusCheck.next_check_at <= func.now())
+                .where(_models.File.study_iuid.is_not(None))
+                .where(_models.StatusCheck.file_id > last_file_id)
+                .order_by(_models.StatusCheck.file_id)
+                .limit(STATUS_REFRESH_CHUNK_SIZE)
+            ).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        last_file_id = rows[-1].file_id
+
+        # Fan out vendor checks under a bounded in-flight limit
+        tasks = {
+            asyncio.create_task(_check_file_status(sem, r.study_iuid, r.study_id, r.status)): r.file_id
+            for r in rows
+        }
+        done, not_done = await asyncio.wait(tasks, timeout=remaining)
+        for t in not_done:
+            t.cancel()
+        if not_done:
+            await asyncio.gather(*not_done, return_exceptions=True)
+
+        # Files still in flight at the deadline stay due and are picked up next cycle
+        results = {}
+        for t in done:
+            results[tasks[t]] = None if t.cancelled() or t.exception() is not None else t.result()
+        if results:
+            _apply_status_results(results)
+        checked += len(done)
+
+        if not_done:
+            print(f"[status_refresher] deadline hit after {checked} files; {len(not_done)} deferred to next cycle")
+            return
+        if len(rows) < STATUS_REFRESH_CHUNK_SIZE:
+            return
 
 
 async def _refresh_pending_files_loop():
     await asyncio.sleep(10)
     while True:
         try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                db = SessionLocal()
-                try:
-                    from sqlalchemy import select
-                    pending = db.execute(
-                        select(_models.File).where(
-                            _models.File.study_iuid.is_not(None)
-                        )
-                    ).scalars().all()
-                    for f in pending:
-                        # Ensure we have a study_id
-                        if not f.study_id and f.study_iuid:
-                            code, data = await _get_json(client, f"{API_BASE}/study/uid/{f.study_iuid}")
-                            if code == 200 and isinstance(data, dict):
-                                sid = data.get("id") or data.get("study_id")
-                                if sid:
-                                    f.study_id = str(sid)
-
-                        # Decide status if we have a study_id and not completed
-                        if f.study_id and f.status != "completed":
-                            code, _ = await _get_json(client, f"{API_BASE}/report/client/completed/{f.study_id}")
-                            if code == 200:
-                                f.status = "completed"
-                            else:
-                                # Details fallback
-                                params = {"report_ids[]": f.study_id}
-                                code2, _ = await _get_json(client, f"{API_BASE}/report/details", params=params)
-                                if code2 == 200:
-                                    f.status = "completed"
-                                else:
-                                    f.status = f.status or "processing"
-                        # If any file has completed, mark its case completed
-                        if f.status == "completed" and f.case_id:
-                            case = db.get(_models.Case, f.case_id)
-                            if case and case.status != "completed":
-                                case.status = "completed"
-                                db.add(case)
-                    db.commit()
-                finally:
-                    db.close()
+            await _refresh_pending_files_once()
         except Exception:
             # swallow errors to keep loop alive
             pass
         await asyncio.sleep(STATUS_REFRESH_INTERVAL)
 
 
-@app.on_event("startup")
-async def _start_status_task():
+def _start_status_task():
     global _status_task
     if _status_task is None:
-        _status_task = asyncio.create_task(_refresh_pending_files_loop())
+        # Only one process across workers/replicas runs the refresher at a time
+        _status_task = asyncio.create_task(run_as_leader("status_refresher", _refresh_pending_files_loop))
 
 
-@app.on_event("shutdown")
 async def _stop_status_task():
     global _status_task
     if _status_task:
         _status_task.cancel()
+        # Let the leader wrapper release its advisory lock before exit
+        await asyncio.gather(_status_task, return_exceptions=True)
         _status_task = None
-
-
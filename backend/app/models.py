@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Text, func, ForeignKey, LargeBinary, Index, cast
+from sqlalchemy.orm import relationship, deferred
 
 from .database import Base
 
@@ -53,6 +53,36 @@ class File(Base):
     patient = relationship("Patient")
     user = relationship("User")
 
+    __table_args__ = (
+        # Ownership check for study-scoped endpoints (viewer links)
+        Index("ix_files_study_iuid_user_id", "study_iuid", "user_id"),
+    )
+
+
+# 5C sharable viewer link per study, generated once and renewed near expiry
+class ViewerLink(Base):
+    __tablename__ = "viewer_links"
+
+    id = Column(Integer, primary_key=True, index=True)
+    study_iuid = Column(String, unique=True, nullable=False)
+    link = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# Work queue for the background status refresher: one row per file still awaiting a report
+class StatusCheck(Base):
+    __tablename__ = "status_checks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), unique=True, nullable=False)
+    next_check_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_vendor_status = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    file = relationship("File")
+
 
 class Case(Base):
     __tablename__ = "cases"
@@ -91,12 +121,14 @@ class Report(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     case_id = Column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), nullable=False)
-    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=True)
+    # One report row per file; upserts conflict on this
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=True, unique=True)
     study_id = Column(String, nullable=True)
     study_iuid = Column(String, nullable=True)
     radiologist_id = Column(Integer, nullable=True)
     report_id = Column(String, nullable=True)
     pdf_url = Column(Text, nullable=True)
+    pdf_object_key = Column(String, nullable=True)  # our mirrored copy in the E2E bucket
     status = Column(String, nullable=True)
     uploaded_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -106,6 +138,23 @@ class Report(Base):
 
 
 
+# Durable report-polling jobs, worked by the in-process pool in utils/report_jobs.py
+class ReportPollJob(Base):
+    __tablename__ = "report_poll_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), unique=True, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending | running | done | failed | idle (lease only)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    file = relationship("File")
+
+
 # Structured reports submitted from the external "opinion report" site
 class StructuredReport(Base):
     __tablename__ = "structured_reports"
@@ -114,7 +163,21 @@ class StructuredReport(Base):
     patient_id = Column(Integer, index=True, nullable=False)
     status = Column(String, nullable=True)
     structured = Column(Text, nullable=True)
-    original_report_pdf = Column(Text, nullable=True)  # can be base64 text or raw bytes repr
-    generated_report_pdf = Column(Text, nullable=True) # can be base64 text or raw bytes repr
+    # PDF blobs are deferred so ORM queries on reports don't pull them out of TOAST
+    original_report_pdf = deferred(Column(Text, nullable=True))  # can be base64 text or raw bytes repr
+    generated_report_pdf = deferred(Column(Text, nullable=True)) # can be base64 text or raw bytes repr
+    # Decoded PDF bytes; filled by trigger on write, by backfill_structured_pdfs.py, or lazily on read
+    original_report_pdf_bin = deferred(Column(LargeBinary, nullable=True))
+    generated_report_pdf_bin = deferred(Column(LargeBinary, nullable=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+
+# Latest-report lookup compares patient_id as text (TEXT on some deployments); see
+# migrations/add_structured_reports_latest_index.sql
+Index(
+    "ix_structured_reports_patient_text_created",
+    cast(StructuredReport.patient_id, Text),
+    StructuredReport.created_at.desc(),
+)
+Index("ix_structured_reports_created_at", StructuredReport.created_at.desc())
+
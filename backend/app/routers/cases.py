@@ -8,6 +8,7 @@ from .. import models, schemas
 from .patients import get_current_user
 from ..utils.slack_notifier import notify_new_case
 from ..utils.whatsapp_gupshup import send_whatsapp_case_update
+from ..utils import events
 
 router = APIRouter(prefix="/cases", tags=["cases"])
 
@@ -105,8 +106,9 @@ def update_case(case_id: int, payload: schemas.CaseUpdate, db: Session = Depends
         case.medical_background = payload.medical_background
     if getattr(payload, "symptoms", None) is not None:
         case.symptoms = payload.symptoms
-    if payload.status is not None:
+    if payload.status is not None and payload.status != case.status:
         case.status = payload.status
+        events.emit_case_status(db, case, user_id=current_user.id)
     db.add(case)
     db.commit()
     db.refresh(case)
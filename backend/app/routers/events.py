@@ -0,0 +1,56 @@
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..utils import events as event_bus
+from .patients import get_current_user, oauth2_scheme
+
+router = APIRouter(tags=["events"])
+
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    token: str | None = None,
+    header_token: str | None = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    """Server-Sent Events stream of the caller's File.status, Case.status and Report.pdf_url changes.
+
+    Browsers' EventSource can't set headers, so the bearer token may also be passed as ?token=.
+    """
+    user = get_current_user(token=header_token or token, db=db)
+    user_id = user.id
+    # Don't hold a pooled connection for the life of the stream
+    db.close()
+
+    async def _stream():
+        with event_bus.subscribe(event_bus.user_topic(user_id)) as queue:
+            yield _sse("ready", {"user_id": user_id})
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    ev = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(ev.get("type") or "message", ev)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,8 @@
 import os
-import httpx
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+import asyncio
+import zipfile
+import zlib
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, BackgroundTasks
 from typing import List
 from sqlalchemy import select, desc
 from sqlalchemy.orm import Session
@@ -8,23 +10,36 @@ from sqlalchemy.orm import Session
 from ..database import get_db
 from .. import models, schemas
 from .patients import get_current_user
+from ..utils.status_queue import enqueue_status_check
+from ..utils.report_jobs import enqueue_report_poll
+from ..utils import fivec_client, study_cache, events, viewer_links
+from ..utils.fivec_client import API_BASE, API_AUTH, FIVEC_WEBHOOK_SECRET
+from ..utils.json_extract import KeyExtractor
+from ..utils.multipart import upload_file_body, fileobj_body
 
 router = APIRouter(prefix="/files", tags=["files"])
-API_BASE = os.getenv("FIVEC_API_BASE", "https://api.5cnetwork.com")
-API_AUTH = os.getenv("FIVEC_API_AUTH")  # e.g., "Bearer <token>" or raw token if API expects basic token
-
-async def _get_json(client: httpx.AsyncClient, url: str, params: dict | None = None):
-    headers = {}
-    if API_AUTH:
-        headers["Authorization"] = API_AUTH
-    r = await client.get(url, params=params, headers=headers)
-    if r.headers.get("content-type", "").startswith("application/json"):
-        try:
-            return r.status_code, r.json()
-        except Exception:
-            return r.status_code, None
-    return r.status_code, None
 
+DICOM_UPLOAD_URL = os.getenv(
+    "DICOM_UPLOAD_URL",
+    "https://router.5cn.co.in/api/dicom/upload?callingAET=secondopinion",
+)
+# Study uploads: instances forwarded at once, and attempts per instance
+STUDY_UPLOAD_CONCURRENCY = int(os.getenv("STUDY_UPLOAD_CONCURRENCY", "8"))
+STUDY_UPLOAD_ATTEMPTS = int(os.getenv("STUDY_UPLOAD_ATTEMPTS", "3"))
+
+# Corrupt ZIP members (bad header, CRC mismatch, broken deflate stream); retrying won't help
+_UNREADABLE_INSTANCE = (zipfile.BadZipFile, zlib.error, EOFError)
+
+# Upload response fields, matched on case/punctuation-insensitive keys
+_upload_fields = KeyExtractor(
+    {
+        "study_iuid": ["studyiuid", "studyinstanceuid", "studyuid"],
+        "s3_url": ["s3url", "fileurl", "url", "location"],
+    },
+    normalize_keys=True,
+    skip_none=True,
+    accept={"s3_url": lambda v: str(v).startswith("http")},
+)
 
 @router.get("/mine", response_model=List[schemas.FileOut])
 def list_my_files(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -48,8 +63,79 @@ def list_my_files(db: Session = Depends(get_db), current_user = Depends(get_curr
     ]
 
 
+def _resolve_upload_case(db: Session, current_user, case_id: int | None) -> tuple[int, int]:
+    """Return (case_id, patient_id) for an upload: the given case if owned, else the user's latest case."""
+    if case_id is not None:
+        case = db.execute(select(models.Case).where(models.Case.id == case_id)).scalar_one_or_none()
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
+        # Verify ownership via patient → user
+        patient = db.execute(select(models.Patient).where(models.Patient.id == case.patient_id)).scalar_one_or_none()
+        if not patient or patient.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not allowed for this case")
+        return case.id, case.patient_id
+    # fallback: latest case for current user
+    case = db.execute(
+        select(models.Case)
+        .join(models.Patient, models.Patient.id == models.Case.patient_id)
+        .where(models.Patient.user_id == current_user.id)
+        .order_by(desc(models.Case.id))
+        .limit(1)
+    ).scalars().first()
+    if not case:
+        raise HTTPException(status_code=400, detail="No case found. Create a case before uploading.")
+    return case.id, case.patient_id
+
+
+def _record_study_file(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    current_user,
+    case_id: int,
+    patient_id: int,
+    study_iuid: str | None,
+) -> models.File:
+    """Create the File row for an uploaded study and queue its status check / report poll."""
+    file_rec = models.File(
+        case_id=case_id,
+        patient_id=patient_id,
+        user_id=current_user.id,
+        file_type="dicom",
+        study_iuid=study_iuid,
+        status="uploaded",
+    )
+    db.add(file_rec)
+    db.flush()
+    if file_rec.study_iuid:
+        enqueue_status_check(db, file_rec.id)
+        # Durable report polling job; with 5C webhooks the report is pushed to us
+        # and the status_checks queue only reconciles missed events
+        if not FIVEC_WEBHOOK_SECRET:
+            enqueue_report_poll(db, file_rec.id)
+    db.commit()
+    db.refresh(file_rec)
+    if file_rec.study_iuid:
+        # Have the viewer link ready before the user first opens the study
+        background_tasks.add_task(viewer_links.prefetch, file_rec.study_iuid)
+    return file_rec
+
+
+def _file_out(file_rec: models.File) -> schemas.FileOut:
+    return schemas.FileOut(
+        id=file_rec.id,
+        case_id=file_rec.case_id,
+        patient_id=file_rec.patient_id,
+        user_id=file_rec.user_id,
+        file_type=file_rec.file_type,
+        study_iuid=file_rec.study_iuid,
+        study_id=file_rec.study_id,
+        status=file_rec.status,
+    )
+
+
 @router.post("/dicom", response_model=schemas.FileOut)
 async def upload_dicom(
+    background_tasks: BackgroundTasks,
     dicomFile: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
@@ -57,27 +143,21 @@ async def upload_dicom(
     patient_id: int | None = None,
 ):
     """Proxy DICOM upload to 5C router and persist StudyIUID and response."""
-    external_url = os.getenv(
-        "DICOM_UPLOAD_URL",
-        "https://router.5cn.co.in/api/dicom/upload?callingAET=secondopinion",
-    )
+    external_url = DICOM_UPLOAD_URL
 
     try:
         # Stream file to external API
         print(f"DEBUG: Uploading to {external_url}")
         print(f"DEBUG: API_AUTH available: {bool(API_AUTH)}")
-        async with httpx.AsyncClient(timeout=120) as client:
-            payload = await dicomFile.read()
-            files = {"dicomFile": (dicomFile.filename, payload, dicomFile.content_type or "application/dicom")}
-            headers = {}
-            if API_AUTH:
-                headers["Authorization"] = API_AUTH
-                print(f"DEBUG: Using auth header: {API_AUTH[:20]}...")
-            else:
-                print("DEBUG: No API_AUTH found, uploading without authentication")
-            resp = await client.post(external_url, files=files, headers=headers)
-            print(f"DEBUG: Upload response status: {resp.status_code}")
-            print(f"DEBUG: Upload response: {resp.text[:200]}...")
+        # The spooled upload is forwarded chunk by chunk; never held in memory whole
+        body = upload_file_body("dicomFile", dicomFile)
+        if API_AUTH:
+            print(f"DEBUG: Using auth header: {API_AUTH[:20]}...")
+        else:
+            print("DEBUG: No API_AUTH found, uploading without authentication")
+        # Shared client adds the auth header; uploads get a longer timeout than API calls
+        resp = await fivec_client.upload(external_url, content=body, headers=body.headers, timeout=120)
+        print(f"DEBUG: Upload response status: {resp.status_code} ({len(resp.content)} bytes, sent {body.size} bytes)")
         # Best-effort parse JSON regardless of header
         data = None
         try:
@@ -93,98 +173,148 @@ async def upload_dicom(
             raise HTTPException(status_code=resp.status_code, detail=data)
 
         # Extract StudyIUID and s3 url (best-effort, nested/case-insensitive)
-        def _walk(obj):
-            if isinstance(obj, dict):
-                for k, v in obj.items():
-                    yield k, v
-                    for t in _walk(v):
-                        yield t
-            elif isinstance(obj, list):
-                for it in obj:
-                    for t in _walk(it):
-                        yield t
-        def _norm(s: str) -> str:
-            return ''.join(ch for ch in s.lower() if ch.isalnum())
-
         study_iuid = None
         s3_url_val = None
         if isinstance(data, (dict, list)):
-            for k, v in _walk(data):
-                nk = _norm(str(k))
-                if v is None:
-                    continue
-                if nk in {"studyiuid","studyinstanceuid","studyuid","study_iuid"}:
-                    study_iuid = str(v)
-                if nk in {"s3url","s3_url","fileurl","url","location"}:
-                    sv = str(v)
-                    if sv.startswith("http"):
-                        s3_url_val = sv
+            ids = _upload_fields.extract(data)
+            study_iuid = str(ids["study_iuid"]) if ids["study_iuid"] is not None else None
+            s3_url_val = str(ids["s3_url"]) if ids["s3_url"] is not None else None
 
         # Resolve case and patient ownership
-        from sqlalchemy import select, desc, func
-        effective_case_id = None
-        effective_patient_id = None
-
-        if case_id is not None:
-            case = db.execute(select(models.Case).where(models.Case.id == case_id)).scalar_one_or_none()
-            if not case:
-                raise HTTPException(status_code=404, detail="Case not found")
-            # Verify ownership via patient → user
-            patient = db.execute(select(models.Patient).where(models.Patient.id == case.patient_id)).scalar_one_or_none()
-            if not patient or patient.user_id != current_user.id:
-                raise HTTPException(status_code=403, detail="Not allowed for this case")
-            effective_case_id = case.id
-            effective_patient_id = case.patient_id
-        else:
-            # fallback: latest case for current user
-            case = db.execute(
-                select(models.Case)
-                .join(models.Patient, models.Patient.id == models.Case.patient_id)
-                .where(models.Patient.user_id == current_user.id)
-                .order_by(desc(models.Case.id))
-            ).scalar_one_or_none()
-            if not case:
-                raise HTTPException(status_code=400, detail="No case found. Create a case before uploading.")
-            effective_case_id = case.id
-            effective_patient_id = case.patient_id
+        effective_case_id, effective_patient_id = _resolve_upload_case(db, current_user, case_id)
 
         # Persist
-        file_rec = models.File(
-            case_id=effective_case_id,
-            patient_id=effective_patient_id,
-            user_id=current_user.id,
-            file_type="dicom",
-            study_iuid=study_iuid,
-            status="uploaded",
-        )
-        db.add(file_rec)
-        db.commit()
-        db.refresh(file_rec)
+        file_rec = _record_study_file(db, background_tasks, current_user, effective_case_id, effective_patient_id, study_iuid)
+
+        return _file_out(file_rec)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        # Trigger report polling/sync in background
+def _study_instances(uploads: list[UploadFile]):
+    """Yield (name, size, opener) per DICOM instance; ZIP parts are expanded member by member.
+
+    `opener()` returns a fresh blocking file object positioned at the start, so a failed
+    forward can be retried. Members are decompressed while streaming, never extracted.
+    """
+    for upload in uploads:
+        if zipfile.is_zipfile(upload.file):
+            upload.file.seek(0)
+            archive = zipfile.ZipFile(upload.file)
+            for info in archive.infolist():
+                base = info.filename.rsplit("/", 1)[-1]
+                if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                yield info.filename, info.file_size, (lambda a=archive, i=info: a.open(i))
+        else:
+            def _open(f=upload.file):
+                f.seek(0)
+                return f
+            yield upload.filename or "instance.dcm", getattr(upload, "size", None), _open
+
+
+async def _forward_instance(name: str, size: int | None, opener) -> tuple[str | None, str | None]:
+    """Upload one instance with retries. Returns (study_iuid, error).
+
+    Raises one of `_UNREADABLE_INSTANCE` (without retrying) if the instance can't be read.
+    """
+    error = None
+    for attempt in range(STUDY_UPLOAD_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(min(2 ** attempt, 10))
+        fileobj = None
+        try:
+            fileobj = await asyncio.to_thread(opener)
+            body = fileobj_body("dicomFile", name.rsplit("/", 1)[-1], fileobj, "application/dicom", size=size)
+            resp = await fivec_client.upload(DICOM_UPLOAD_URL, content=body, headers=body.headers, timeout=120)
+        except _UNREADABLE_INSTANCE:
+            raise
+        except HTTPException as e:
+            # Gateway shedding load (503): back off and retry
+            error = str(e.detail)
+            continue
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            continue
+        finally:
+            if isinstance(fileobj, zipfile.ZipExtFile):
+                fileobj.close()
+        if resp.status_code == 429 or resp.status_code >= 500:
+            error = f"router returned {resp.status_code}"
+            continue
+        if resp.status_code >= 400:
+            return None, f"router returned {resp.status_code}"
         try:
-            import asyncio
-            from .reports import poll_and_store_report_for_file
-            asyncio.create_task(poll_and_store_report_for_file(file_rec.id, db))
+            data = resp.json()
         except Exception:
-            pass
+            data = None
+        ids = _upload_fields.extract(data) if isinstance(data, (dict, list)) else {"study_iuid": None}
+        return (str(ids["study_iuid"]) if ids["study_iuid"] is not None else None), None
+    return None, error
 
-        return schemas.FileOut(
-            id=file_rec.id,
-            case_id=file_rec.case_id,
-            patient_id=file_rec.patient_id,
-            user_id=file_rec.user_id,
-            file_type=file_rec.file_type,
-            study_iuid=file_rec.study_iuid,
-            study_id=file_rec.study_id,
-            status=file_rec.status,
-        )
-    except HTTPException:
-        raise
+
+@router.post("/dicom/study")
+async def upload_dicom_study(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(..., description="DICOM instances and/or ZIP archives of a study"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+    case_id: int | None = None,
+):
+    """Upload a whole study (many instances or a ZIP) to the 5C router.
+
+    Instances are forwarded STUDY_UPLOAD_CONCURRENCY at a time with retries. One File row (and
+    one status check / report poll) is recorded per StudyIUID, not per instance.
+    """
+    # Authorize before sending anything to the vendor
+    effective_case_id, effective_patient_id = _resolve_upload_case(db, current_user, case_id)
+    # Don't hold a pooled connection while instances upload
+    db.close()
+
+    try:
+        instances = list(_study_instances(files))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {e}")
+    if not instances:
+        raise HTTPException(status_code=400, detail="No DICOM instances in upload")
+
+    sem = asyncio.Semaphore(STUDY_UPLOAD_CONCURRENCY)
+
+    async def _one(name, size, opener):
+        async with sem:
+            try:
+                return name, *(await _forward_instance(name, size, opener)), False
+            except _UNREADABLE_INSTANCE as e:
+                return name, None, f"Unreadable instance: {str(e) or e.__class__.__name__}", True
+
+    results = await asyncio.gather(*(_one(*inst) for inst in instances))
+    failed = [{"name": name, "error": error} for name, _, error, _ in results if error]
+    study_iuids = list(dict.fromkeys(iuid for _, iuid, error, _ in results if iuid and not error))
+    print(f"[study_upload] {len(instances)} instances, {len(failed)} failed, {len(study_iuids)} studies")
+    if all(unreadable for *_, unreadable in results):
+        raise HTTPException(status_code=400, detail={"message": "No readable DICOM instances in upload", "failed": failed[:20]})
+    if len(failed) == len(instances):
+        raise HTTPException(status_code=502, detail={"message": "All instances failed to upload", "failed": failed[:20]})
+
+    try:
+        records = [
+            _record_study_file(db, background_tasks, current_user, effective_case_id, effective_patient_id, iuid)
+            for iuid in (study_iuids or [None])
+        ]
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {
+        "files": [_file_out(r) for r in records],
+        "instances": len(instances),
+        "uploaded": len(instances) - len(failed),
+        "failed": failed,
+    }
+
 
 @router.get("/{file_id}", response_model=schemas.FileOut)
 def get_file(file_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -221,38 +351,33 @@ async def refresh_status(file_id: int, db: Session = Depends(get_db), current_us
     if not owner_ok:
         raise HTTPException(status_code=403, detail="Not allowed for this file")
 
+    previous_status = file_rec.status
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            # If no study_id, try resolving from Study IUID
-            if not file_rec.study_id and file_rec.study_iuid:
-                code, data = await _get_json(client, f"{API_BASE}/study/uid/{file_rec.study_iuid}")
-                if code == 200 and isinstance(data, dict):
-                    # Map sample response: {"id": 5746411, "study_uid": "...", "status": "COMPLETED"}
-                    sid = data.get("id") or data.get("study_id")
-                    if sid is not None:
-                        file_rec.study_id = str(sid)
-                    # Update status directly if present
-                    status_val = (data.get("status") or "").lower()
-                    if status_val:
-                        file_rec.status = "completed" if status_val == "completed" else file_rec.status or "processing"
-                    # Do not store extra metadata in files; that belongs in reports
-
-            # If we have a study_id, attempt to detect report status
-            if file_rec.study_id:
-                # Try completed endpoint first
-                code, data = await _get_json(client, f"{API_BASE}/report/client/completed/{file_rec.study_id}")
-                if code == 200:
+        # If no study_id, try resolving from Study IUID
+        if not file_rec.study_id and file_rec.study_iuid:
+            # Cached: many instances of a study resolve to the same id
+            sid = await study_cache.resolve_study_id(file_rec.study_iuid)
+            if sid is not None:
+                file_rec.study_id = sid
+
+        # If we have a study_id, attempt to detect report status
+        if file_rec.study_id:
+            # Try completed endpoint first
+            code, data = await fivec_client.get_json(f"{API_BASE}/report/client/completed/{file_rec.study_id}")
+            if code == 200:
+                file_rec.status = "completed"
+            else:
+                # Try details endpoint as fallback
+                params = {"report_ids[]": file_rec.study_id}
+                code2, data2 = await fivec_client.get_json(f"{API_BASE}/report/details", params=params)
+                if code2 == 200:
                     file_rec.status = "completed"
                 else:
-                    # Try details endpoint as fallback
-                    params = {"report_ids[]": file_rec.study_id}
-                    code2, data2 = await _get_json(client, f"{API_BASE}/report/details", params=params)
-                    if code2 == 200:
-                        file_rec.status = "completed"
-                    else:
-                        file_rec.status = "processing"
+                    file_rec.status = "processing"
 
         db.add(file_rec)
+        if file_rec.status != previous_status:
+            events.emit_file_status(db, file_rec)
         db.commit()
         db.refresh(file_rec)
         return schemas.FileOut(
@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from .. import models
+from ..utils.fivec_client import FIVEC_WEBHOOK_SECRET
+from ..utils.status_queue import enqueue_status_check
+from ..utils.report_mirror import schedule_mirror
+from ..utils.json_extract import KeyExtractor
+from .reports import store_report_items, mark_file_completed
+
+router = APIRouter(prefix="/fivec", tags=["fivec"])
+
+_study_fields = KeyExtractor({
+    "study_iuid": ["study_iuid", "study_uid", "studyInstanceUID", "StudyInstanceUID"],
+    "study_id": ["study_id", "study_fk"],
+})
+
+
+def _events(payload) -> list[dict]:
+    """Accept a single event, a list of events, or {"events": [...]}."""
+    if isinstance(payload, dict) and isinstance(payload.get("events"), list):
+        payload = payload["events"]
+    events = payload if isinstance(payload, list) else [payload]
+    out = []
+    for ev in events:
+        if not isinstance(ev, dict):
+            continue
+        # Report fields may sit at the top level or under data/payload/report
+        body = ev.get("data") or ev.get("payload") or ev.get("report")
+        out.append(body if isinstance(body, dict) else ev)
+    return out
+
+
+@router.post("/webhook")
+async def fivec_report_webhook(request: Request, db: Session = Depends(get_db)):
+    """Ingest report events pushed by 5C and upsert Report/File/Case state.
+
+    Requests are authenticated with an HMAC-SHA256 of the raw body using FIVEC_WEBHOOK_SECRET,
+    sent hex-encoded in the X-5C-Signature header. Files are matched by study_id or StudyIUID.
+    """
+    body = await request.body()
+    signature = request.headers.get("X-5C-Signature")
+
+    if not FIVEC_WEBHOOK_SECRET:
+        raise HTTPException(status_code=500, detail="Webhook secret not configured")
+    if not signature:
+        raise HTTPException(status_code=400, detail="Missing signature header")
+
+    expected_signature = hmac.new(FIVEC_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected_signature):
+        raise HTTPException(status_code=400, detail="Invalid signature")
+
+    try:
+        payload = json.loads(body)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    updated, completed, unmatched = [], [], 0
+    mirrored = []
+    entries = []
+    for item in _events(payload):
+        ids = _study_fields.extract(item)
+        study_iuid, study_id = ids["study_iuid"], ids["study_id"]
+        conds = []
+        if study_id is not None:
+            conds.append(models.File.study_id == str(study_id))
+        if study_iuid:
+            conds.append(models.File.study_iuid == str(study_iuid))
+        if not conds:
+            unmatched += 1
+            continue
+        files = db.execute(select(models.File).where(or_(*conds))).scalars().all()
+        if not files:
+            unmatched += 1
+            continue
+        for file_rec in files:
+            if study_id is not None and not file_rec.study_id:
+                file_rec.study_id = str(study_id)
+            entries.append((file_rec, item, None))
+
+    # All events' reports in one upsert
+    stored = store_report_items(db, entries)
+    for file_rec in {f.id: f for f, _, _ in entries}.values():
+        report_rec = stored[file_rec.id]
+        if report_rec.pdf_url:
+            mark_file_completed(db, file_rec)
+            completed.append(file_rec.id)
+            mirrored.append(report_rec)
+        else:
+            # Event without a PDF yet: have the reconciliation queue look at it right away
+            enqueue_status_check(db, file_rec.id)
+        updated.append(file_rec.id)
+    db.commit()
+    for report_rec in mirrored:
+        schedule_mirror(report_rec.id)
+
+    return {"ok": True, "updated_files": updated, "completed_files": completed, "unmatched_events": unmatched}
@@ -12,6 +12,7 @@ from .. import models, schemas
 from .patients import get_current_user
 from ..utils.slack_notifier import notify_new_case
 from ..utils.whatsapp_gupshup import send_whatsapp_case_update
+from ..utils import events
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +46,7 @@ def create_payment(payload: schemas.PaymentCreate, db: Session = Depends(get_db)
     if (payload.payment_status or '').lower() in {"success","captured","paid"}:
         case.status = "processing"
         db.add(case)
+        events.emit_case_status(db, case, user_id=current_user.id)
         # Notify Slack with real data
         try:
             patient_name = (patient.first_name or "").strip() + (" " + (patient.last_name or "").strip() if patient.last_name else "")
@@ -64,25 +66,15 @@ def create_payment(payload: schemas.PaymentCreate, db: Session = Depends(get_db)
             # Do not block payment on WhatsApp errors
             pass
         try:
-            # Find latest file(s) for this case and trigger a sync to populate reports
+            # Find latest file(s) for this case and queue a sync to populate reports
             from sqlalchemy import select, desc
+            from ..utils.report_jobs import enqueue_report_poll
             latest_files = db.execute(
                 select(models.File).where(models.File.case_id == case.id).order_by(desc(models.File.id)).limit(3)
             ).scalars().all()
-            import httpx, asyncio
-            async def _sync_all():
-                async with httpx.AsyncClient(timeout=30) as client:
-                    from .reports import sync_report_from_study_uid
-                    for f in latest_files:
-                        try:
-                            await sync_report_from_study_uid(f.id, db, current_user)  # reuse same db/session
-                        except Exception:
-                            pass
-            try:
-                asyncio.create_task(_sync_all())
-            except RuntimeError:
-                # If not in async loop, ignore and let background refresher handle it
-                pass
+            for f in latest_files:
+                if f.study_iuid:
+                    enqueue_report_poll(db, f.id)
         except Exception:
             pass
     db.commit()
@@ -193,6 +185,7 @@ async def razorpay_webhook(request: Request, db: Session = Depends(get_db)):
             if case:
                 case.status = "processing"
                 db.add(case)
+                events.emit_case_status(db, case)
                 
                 # Notify Slack and WhatsApp
                 try:
@@ -281,6 +274,7 @@ async def verify_payment(
     # Update case status
     case.status = "processing"
     db.add(case)
+    events.emit_case_status(db, case, user_id=current_user.id)
     db.commit()
     
     return {"status": "success", "message": "Payment verified successfully"}
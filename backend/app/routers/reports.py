@@ -1,159 +1,217 @@
 import os
-import httpx
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, select, func, or_, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import asyncio
 from datetime import datetime
 
 from ..database import get_db
-from .. import models
+from .. import models, schemas
 from .patients import get_current_user
+from ..utils.report_batcher import report_details
+from ..utils import fivec_client, study_cache
+from ..utils.fivec_client import API_BASE, API_AUTH
+from ..utils.status_queue import clear_status_check
+from ..utils.report_jobs import run_report_poll, enqueue_report_poll, wait_for_report
+from ..utils import events, viewer_links
+from ..utils.json_extract import KeyExtractor
+from ..utils.report_mirror import schedule_mirror, report_pdf_url
+from ..utils.pdf_cache import pdf_cache
+from ..utils.conditional import is_not_modified, range_allowed, bytes_response, file_response
+from ..utils.structured_pdf import is_pdf, load_pdf_column, store_pdf_bin
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
-API_BASE = os.getenv("FIVEC_API_BASE", "https://api.5cnetwork.com")
-API_AUTH = os.getenv("FIVEC_API_AUTH")
 FIVEC_RAD_ID = os.getenv("FIVEC_RAD_ID")
 FIVEC_CLIENT_FK = os.getenv("FIVEC_CLIENT_FK")
 ALLOW_DEMO_REPORTS = os.getenv("ALLOW_DEMO_REPORTS", "false").lower() == "true"
+# Upper bound for GET /reports/{file_id}/pdf?wait=...
+REPORT_PDF_MAX_WAIT_SECONDS = int(os.getenv("REPORT_PDF_MAX_WAIT_SECONDS", "25"))
+# Concurrent vendor checks per POST /reports/sync request
+REPORT_SYNC_CONCURRENCY = int(os.getenv("REPORT_SYNC_CONCURRENCY", "16"))
 
 
 # -------------------------------
 # Helpers
 # -------------------------------
 
-async def _get_json(client: httpx.AsyncClient, url: str, params: dict | None = None):
-    headers = {}
-    if API_AUTH:
-        headers["Authorization"] = API_AUTH
-    r = await client.get(url, params=params, headers=headers)
-    try:
-        return r.status_code, r.json()
-    except Exception:
-        return r.status_code, None
+# Aliases the vendor uses across the details response and webhook events
+_report_item_fields = KeyExtractor({
+    "pdf_url": ["pdf_url", "s3_url", "url", "fileUrl", "location"],
+    "uploaded_at": ["completed_date", "created_at", "updated_at", "updatedAt"],
+})
+
 
+# -------------------------------
+# Core: Poll + store reports
+# -------------------------------
 
-def _extract(value: dict | list | None, keys: list[str]):
+def _parse_uploaded_at(value):
     if not value:
         return None
-    if isinstance(value, dict):
-        for k in keys:
-            if k in value:
-                return value[k]
-        for v in value.values():
-            res = _extract(v, keys)
-            if res is not None:
-                return res
-    if isinstance(value, list):
-        for item in value:
-            res = _extract(item, keys)
-            if res is not None:
-                return res
+    for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"]:
+        try:
+            return datetime.strptime(str(value), fmt)
+        except Exception:
+            continue
     return None
 
 
-# -------------------------------
-# Core: Poll + store reports
-# -------------------------------
+def _report_row(file_rec: models.File, item: dict, rad_id: str | None = None) -> dict:
+    fields = _report_item_fields.extract(item)
+    rad_id = rad_id or (str(item["rad_fk"]) if item.get("rad_fk") else None)
+    return {
+        "case_id": file_rec.case_id,
+        "file_id": file_rec.id,
+        "study_id": file_rec.study_id,
+        "study_iuid": file_rec.study_iuid,
+        "report_id": str(item.get("id")) if item.get("id") else None,
+        "radiologist_id": int(rad_id) if rad_id and str(rad_id).isdigit() else None,
+        "pdf_url": fields["pdf_url"],
+        "status": str(item.get("status") or "").upper() or None,
+        "uploaded_at": _parse_uploaded_at(fields["uploaded_at"]),
+    }
+
+
+def store_report_items(db: Session, entries: list[tuple[models.File, dict, str | None]]) -> dict:
+    """Upsert Report rows for a batch of (file, vendor report item, rad_id) in one statement.
+
+    Items for the same file are folded in order (later non-null values win, as if applied one by
+    one) and written with INSERT ... ON CONFLICT (file_id) DO UPDATE, keeping existing values
+    where the new ones are null. A changed pdf_url drops the mirrored copy's key, so the old PDF
+    isn't served for the new report. Returns {file_id: row(id, file_id, pdf_url, pdf_object_key)}.
+    Caller commits.
+    """
+    merged: dict[int, dict] = {}
+    files: dict[int, models.File] = {}
+    for file_rec, item, rad_id in entries:
+        row = _report_row(file_rec, item, rad_id)
+        files[file_rec.id] = file_rec
+        current = merged.setdefault(file_rec.id, dict(row))
+        for k, v in row.items():
+            if v is not None:
+                current[k] = v
+    if not merged:
+        return {}
+
+    # Previous pdf_url, to announce only reports that just became available
+    previous = dict(db.execute(
+        select(models.Report.file_id, models.Report.pdf_url).where(models.Report.file_id.in_(list(merged)))
+    ).all())
+
+    table = models.Report.__table__
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(table).values(list(merged.values()))
+    new_pdf_url = func.coalesce(stmt.excluded.pdf_url, table.c.pdf_url)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.file_id],
+        set_={
+            col: func.coalesce(stmt.excluded[col], table.c[col])
+            for col in ("report_id", "radiologist_id", "pdf_url", "status", "uploaded_at")
+        } | {
+            "pdf_object_key": case(
+                (new_pdf_url.is_distinct_from(table.c.pdf_url), None),
+                else_=table.c.pdf_object_key,
+            ),
+        },
+    ).returning(table.c.id, table.c.file_id, table.c.pdf_url, table.c.pdf_object_key)
+    stored = {row.file_id: row for row in db.execute(stmt)}
+
+    for file_id, row in stored.items():
+        if row.pdf_url and row.pdf_url != previous.get(file_id):
+            events.emit_report(db, row, files[file_id])
+    return stored
+
+
+def mark_file_completed(db: Session, file_rec: models.File) -> None:
+    """Mark a file and its case completed once its report PDF is known. Caller commits."""
+    if file_rec.status != "completed":
+        file_rec.status = "completed"
+        events.emit_file_status(db, file_rec)
+    db.add(file_rec)
+    clear_status_check(db, file_rec.id)
+    if file_rec.case_id:
+        case = db.get(models.Case, file_rec.case_id)
+        if case:
+            if case.status != "completed":
+                case.status = "completed"
+                events.emit_case_status(db, case, user_id=file_rec.user_id)
+            db.add(case)
+
+
+def _save_study_id(db: Session, file_rec: models.File, study_id) -> None:
+    file_rec.study_id = study_id
+    db.add(file_rec); db.commit(); db.refresh(file_rec)
+
+
+def _store_details(db: Session, file_rec: models.File, entries: list):
+    """Store a whole details batch in one upsert and one commit; returns the file's report row."""
+    report_rec = store_report_items(db, entries)[file_rec.id]
+    if report_rec.pdf_url:
+        mark_file_completed(db, file_rec)
+    db.commit()
+    return report_rec
+
 
 async def poll_and_store_report_for_file(file_id: int, db: Session, max_attempts: int = 18, delay_seconds: int = 10):
     """
     Orchestrate APIs (2 → 3 → 4) with polling. Upserts into reports table, updates file & case status.
+    Returns True once the report PDF is stored, False if it wasn't ready within `max_attempts`.
+    Database work runs in a worker thread so polls don't block the event loop.
     """
-    file_rec = db.get(models.File, file_id)
+    file_rec = await asyncio.to_thread(db.get, models.File, file_id)
     if not file_rec:
-        return
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        # 1. Ensure study_id from study_iuid
-        if not file_rec.study_id and file_rec.study_iuid:
-            code, data = await _get_json(client, f"{API_BASE}/study/uid/{file_rec.study_iuid}")
-            if code == 200 and isinstance(data, dict):
-                sid = _extract(data, ["id", "study_id"])
-                if sid:
-                    file_rec.study_id = str(sid)
-                    db.add(file_rec); db.commit(); db.refresh(file_rec)
-
-        if not file_rec.study_id:
-            return
-
-        # 2. Poll until pdf_url ready
-        for _ in range(max_attempts):
-            code_c, data_c = await _get_json(client, f"{API_BASE}/report/client/completed/{file_rec.study_id}")
-            rad_id, report_ids = None, []
-            if code_c == 200 and data_c:
-                if isinstance(data_c, list):
-                    for it in data_c:
-                        if isinstance(it, dict):
-                            if it.get("id"):
-                                report_ids.append(str(it["id"]))
-                            if it.get("rad_fk") and not rad_id:
-                                rad_id = str(it["rad_fk"])
-                elif isinstance(data_c, dict):
-                    if data_c.get("id"):
-                        report_ids.append(str(data_c["id"]))
-                    if data_c.get("rad_fk"):
-                        rad_id = str(data_c["rad_fk"])
-            if not report_ids:
-                report_ids = [str(file_rec.study_id)]
-
-            # fetch details with pdf_url
-            params = {"send_pdf_url": "true"}
-            for rid in report_ids:
-                params.setdefault("report_ids[]", []).append(rid)
-            if rad_id:
-                params["rad_id"] = rad_id
-            if FIVEC_CLIENT_FK:
-                params["client_fk"] = FIVEC_CLIENT_FK
-
-            code_d, data_d = await _get_json(client, f"{API_BASE}/report/details", params=params)
-            if code_d == 200 and data_d:
-                items = data_d if isinstance(data_d, list) else [data_d]
-                for item in items:
-                    if not isinstance(item, dict):
-                        continue
-                    pdf_url = _extract(item, ["pdf_url", "s3_url", "url", "fileUrl", "location"])
-                    rid = str(item.get("id")) if item.get("id") else None
-                    status = str(item.get("status") or "").upper() or "PENDING"
-                    uploaded_at = _extract(item, ["completed_date", "created_at", "updated_at", "updatedAt"])
-
-                    # upsert report
-                    report_rec = db.query(models.Report).filter(models.Report.file_id == file_rec.id).first()
-                    if not report_rec:
-                        report_rec = models.Report(
-                            case_id=file_rec.case_id,
-                            file_id=file_rec.id,
-                            study_id=file_rec.study_id,
-                            study_iuid=file_rec.study_iuid,
-                        )
-                    report_rec.report_id = rid or report_rec.report_id
-                    report_rec.radiologist_id = rad_id or report_rec.radiologist_id
-                    report_rec.pdf_url = pdf_url or report_rec.pdf_url
-                    report_rec.status = status or report_rec.status
-
-                    if uploaded_at:
-                        for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"]:
-                            try:
-                                report_rec.uploaded_at = datetime.strptime(str(uploaded_at), fmt)
-                                break
-                            except Exception:
-                                continue
-
-                    db.add(report_rec); db.commit(); db.refresh(report_rec)
-
-                    if pdf_url:
-                        file_rec.status = "completed"
-                        db.add(file_rec)
-                        if file_rec.case_id:
-                            case = db.get(models.Case, file_rec.case_id)
-                            if case:
-                                case.status = "completed"
-                                db.add(case)
-                        db.commit()
-                        return
+        return False
+
+    # 1. Ensure study_id from study_iuid
+    if not file_rec.study_id and file_rec.study_iuid:
+        sid = await study_cache.resolve_study_id(file_rec.study_iuid)
+        if sid:
+            await asyncio.to_thread(_save_study_id, db, file_rec, sid)
+
+    if not file_rec.study_id:
+        return False
+
+    # 2. Poll until pdf_url ready
+    for attempt in range(max_attempts):
+        code_c, data_c = await fivec_client.get_json(f"{API_BASE}/report/client/completed/{file_rec.study_id}")
+        rad_id, report_ids = None, []
+        if code_c == 200 and data_c:
+            if isinstance(data_c, list):
+                for it in data_c:
+                    if isinstance(it, dict):
+                        if it.get("id"):
+                            report_ids.append(str(it["id"]))
+                        if it.get("rad_fk") and not rad_id:
+                            rad_id = str(it["rad_fk"])
+            elif isinstance(data_c, dict):
+                if data_c.get("id"):
+                    report_ids.append(str(data_c["id"]))
+                if data_c.get("rad_fk"):
+                    rad_id = str(data_c["rad_fk"])
+        if not report_ids:
+            report_ids = [str(file_rec.study_id)]
+
+        # fetch details with pdf_url (batched with other files' lookups)
+        items = await report_details.load_many(
+            report_ids,
+            send_pdf_url="true",
+            rad_id=rad_id,
+            client_fk=FIVEC_CLIENT_FK,
+        )
+        entries = [(file_rec, item, rad_id) for item in (items or []) if isinstance(item, dict)]
+        if entries:
+            report_rec = await asyncio.to_thread(_store_details, db, file_rec, entries)
+            if report_rec.pdf_url:
+                schedule_mirror(report_rec.id)
+                return True
+        if attempt < max_attempts - 1:
             await asyncio.sleep(delay_seconds)
+    return False
 
 
 # -------------------------------
@@ -173,13 +231,105 @@ async def sync_report_from_study_uid(file_id: int, db: Session = Depends(get_db)
     if not API_AUTH:
         raise HTTPException(status_code=500, detail="FIVEC_API_AUTH is not configured")
 
-    await poll_and_store_report_for_file(file_id, db)
+    # Joins any poll already running for this file (here or in another worker)
+    await run_report_poll(file_id, max_attempts=18, delay_seconds=10)
+    db.refresh(file_rec)
     return {"ok": True, "file_id": file_id, "study_id": file_rec.study_id}
 
 
+@router.post("/sync")
+async def sync_reports(
+    case_id: int | None = Query(None),
+    body: schemas.ReportSyncRequest | None = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Sync reports for every file of a case (`?case_id=`) and/or a list of file ids.
+
+    Ownership is checked with one query. Files whose PDF is already stored are answered from
+    their report row; the rest are checked against 5C concurrently (details lookups share the
+    batcher), one vendor check each. Returns a per-file outcome: completed, pending, skipped
+    (nothing to look up yet), not_found or error.
+    """
+    file_ids = list(dict.fromkeys(body.file_ids)) if body else []
+    if case_id is None and not file_ids:
+        raise HTTPException(status_code=400, detail="case_id or file_ids required")
+    if not API_AUTH:
+        raise HTTPException(status_code=500, detail="FIVEC_API_AUTH is not configured")
+
+    scope = []
+    if case_id is not None:
+        scope.append(models.File.case_id == case_id)
+    if file_ids:
+        scope.append(models.File.id.in_(file_ids))
+    owned = db.execute(
+        select(models.File.id, models.File.study_id, models.File.study_iuid)
+        .join(models.Patient, models.Patient.id == models.File.patient_id)
+        .where(models.Patient.user_id == current_user.id)
+        .where(or_(*scope))
+        .order_by(models.File.id)
+    ).all()
+    if case_id is not None and not file_ids and not owned:
+        raise HTTPException(status_code=404, detail="No files found for this case")
+
+    stored = {
+        report_rec.file_id: report_pdf_url(report_rec)
+        for report_rec in db.execute(
+            select(models.Report)
+            .where(models.Report.file_id.in_([row.id for row in owned]))
+            .where(models.Report.pdf_url.is_not(None))
+        ).scalars()
+    }
+
+    # Don't hold a pooled connection across the vendor calls
+    db.close()
+
+    sem = asyncio.Semaphore(REPORT_SYNC_CONCURRENCY)
+
+    async def _sync_one(fid: int) -> tuple[int, str, str | None]:
+        async with sem:
+            try:
+                found = await run_report_poll(fid, max_attempts=1)
+            except Exception as e:
+                return fid, "error", str(e)[:200]
+        return fid, ("completed" if found else "pending"), None
+
+    targets = [row.id for row in owned if row.id not in stored and (row.study_id or row.study_iuid)]
+    results = await asyncio.gather(*(_sync_one(fid) for fid in targets))
+
+    outcomes = {fid: {"file_id": fid, "status": "not_found"} for fid in file_ids}
+    for row in owned:
+        outcomes[row.id] = {"file_id": row.id, "status": "skipped"}
+    for fid, url in stored.items():
+        outcomes[fid] = {"file_id": fid, "status": "completed", "pdf_url": url}
+    for fid, status, error in results:
+        outcomes[fid] = {"file_id": fid, "status": status}
+        if error:
+            outcomes[fid]["error"] = error
+
+    completed = [fid for fid, o in outcomes.items() if o["status"] == "completed" and fid not in stored]
+    if completed:
+        reports = db.execute(select(models.Report).where(models.Report.file_id.in_(completed))).scalars().all()
+        for report_rec in reports:
+            if report_rec.pdf_url:
+                outcomes[report_rec.file_id]["pdf_url"] = report_pdf_url(report_rec)
+        db.close()
+
+    return {"ok": True, "case_id": case_id, "files": list(outcomes.values())}
+
+
 @router.get("/{file_id}/pdf")
-async def get_report_pdf(file_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    """Return report pdf url(s) for a file, syncing if missing."""
+async def get_report_pdf(
+    file_id: int,
+    wait: str | None = Query(None, pattern=r"^\d+s?$", description="Long-poll up to N seconds, e.g. 25s"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Return report pdf url(s) for a file.
+
+    If the report isn't ready a poll job is queued and 202 is returned with a status handle;
+    with `?wait=25s` the request is held (bounded) and answers as soon as the report is stored.
+    """
     file_rec = db.get(models.File, file_id)
     if not file_rec:
         raise HTTPException(status_code=404, detail="File not found")
@@ -189,84 +339,58 @@ async def get_report_pdf(file_id: int, db: Session = Depends(get_db), current_us
 
     existing = db.query(models.Report).filter(models.Report.file_id == file_rec.id).first()
     if existing and existing.pdf_url:
-        return {"file_id": file_rec.id, "study_id": file_rec.study_id, "pdf_urls": [existing.pdf_url]}
+        return {"file_id": file_rec.id, "study_id": file_rec.study_id, "pdf_urls": [report_pdf_url(existing)]}
 
     if not API_AUTH:
         raise HTTPException(status_code=404, detail="Report PDF not available yet")
 
-    await poll_and_store_report_for_file(file_id, db)
-    existing = db.query(models.Report).filter(models.Report.file_id == file_rec.id).first()
-    if existing and existing.pdf_url:
-        return {"file_id": file_rec.id, "study_id": file_rec.study_id, "pdf_urls": [existing.pdf_url]}
-    raise HTTPException(status_code=404, detail="Report PDF not available yet")
+    # Fetch in the worker pool rather than holding this request and its session
+    enqueue_report_poll(db, file_rec.id)
+    db.commit()
+
+    if wait:
+        timeout = min(int(wait.rstrip("s")), REPORT_PDF_MAX_WAIT_SECONDS)
+        if timeout > 0 and await wait_for_report(file_rec.id, timeout=timeout):
+            db.expire_all()
+            existing = db.query(models.Report).filter(models.Report.file_id == file_rec.id).first()
+            if existing and existing.pdf_url:
+                return {"file_id": file_rec.id, "study_id": file_rec.study_id, "pdf_urls": [report_pdf_url(existing)]}
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "file_id": file_rec.id,
+            "study_id": file_rec.study_id,
+            "status": "pending",
+            "status_url": f"/reports/{file_rec.id}/pdf?wait={REPORT_PDF_MAX_WAIT_SECONDS}s",
+        },
+        headers={"Retry-After": "5"},
+    )
 
 
 @router.get("/viewer-link")
 async def get_viewer_link_by_iuid(study_iuid: str = Query(...), db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     if not API_AUTH:
         raise HTTPException(status_code=500, detail="FIVEC_API_AUTH not configured")
-    async with httpx.AsyncClient(timeout=30) as client:
-        code, data = await _get_json(client, f"{API_BASE}/dicom/v2/sharable-image-link", params={"study_iuid": study_iuid})
-        if code != 200 or not data:
-            raise HTTPException(status_code=502, detail="viewer-link failed")
-        link = _extract(data, ["url", "link", "sharable_link", "viewer_url"]) or data
-        return {"study_iuid": study_iuid, "viewer_link": link}
+    # Only studies the caller uploaded (ix_files_study_iuid_user_id)
+    owned = db.execute(
+        select(models.File.id)
+        .where(models.File.study_iuid == study_iuid, models.File.user_id == current_user.id)
+        .limit(1)
+    ).first()
+    db.close()
+    if not owned:
+        raise HTTPException(status_code=403, detail="Not allowed for this study")
+    link = await viewer_links.get_viewer_link(study_iuid)
+    if not link:
+        raise HTTPException(status_code=502, detail="viewer-link failed")
+    return {"study_iuid": study_iuid, "viewer_link": link}
 
 
 # -------------------------------
 # Structured reports: fetch from local DB (submitted by opinion site)
 # -------------------------------
 
-def _b64_or_raw_to_bytes(value: str | bytes | bytearray | memoryview | None) -> bytes | None:
-    if value is None:
-        return None
-    # Direct bytes-like from DB (e.g., BYTEA -> memoryview)
-    try:
-        if isinstance(value, (bytes, bytearray, memoryview)):
-            b = bytes(value)
-            if b:
-                return b
-    except Exception:
-        pass
-    s = str(value).strip()
-    # Handle data URLs like: data:application/pdf;base64,<data>
-    if s.lower().startswith("data:application/pdf;base64,"):
-        s = s.split(",", 1)[1]
-    # Try base64 if it looks like base64
-    try:
-        import base64
-        # Heuristic: base64 uses only A-Z a-z 0-9 + / = and optional newlines
-        import re
-        if re.fullmatch(r"[A-Za-z0-9+/=\r\n\s]+", s):
-            decoded = base64.b64decode(s, validate=False)
-            if decoded.startswith(b"%PDF"):
-                return decoded
-            # If decoded produces bytes, still acceptable as PDF
-            if decoded:
-                return decoded
-    except Exception:
-        pass
-    # If the string itself looks like a PDF content (starts with %PDF), encode using latin-1 to preserve byte values
-    if s.startswith("%PDF"):
-        try:
-            return s.encode("latin-1", errors="ignore")
-        except Exception:
-            pass
-    # If looks like an escaped JSON string with \n, \r, etc., try unescaping
-    try:
-        import codecs
-        unescaped = codecs.decode(s, 'unicode_escape')
-        if unescaped.startswith("%PDF"):
-            return unescaped.encode("latin-1", errors="ignore")
-    except Exception:
-        pass
-    # Fallback: try latin-1 encoding to preserve raw bytes as-is
-    try:
-        return s.encode("latin-1", errors="ignore")
-    except Exception:
-        return None
-
-
 @router.get("/latest", summary="Get latest structured report by patient or case")
 def get_latest_structured_report(
     patient_id: int | None = None,
@@ -293,6 +417,7 @@ def get_latest_structured_report(
             raise HTTPException(status_code=403, detail="Not allowed for this patient")
 
     # patient_id in structured_reports can be TEXT; compare as text
+    # (served by the ix_structured_reports_patient_text_created expression index)
     sr = db.execute(text(
         """
         select id, status from structured_reports
@@ -326,16 +451,93 @@ def get_latest_structured_report(
     }
 
 
+def _structured_report_meta(db: Session, report_id: int):
+    """Fetch the cheap columns of a structured report plus a row version for cache keys."""
+    if db.get_bind().dialect.name == "postgresql":
+        # xmin changes on every update of the row, so a rewritten PDF never hits a stale entry
+        sql = "select id, patient_id, xmin::text as row_version from structured_reports where id = :id"
+    else:
+        sql = "select id, patient_id, cast(created_at as text) as row_version from structured_reports where id = :id"
+    return db.execute(text(sql), {"id": report_id}).mappings().first()
+
+
+def _decode_structured_pdf(db: Session, report_id: int, type: str) -> tuple[Optional[bytes], bool]:
+    """Decode the requested PDF (alternate column as fallback). Returns (bytes, row_was_updated)."""
+    field = "generated_report_pdf" if type == "generated" else "original_report_pdf"
+    alt_field = "original_report_pdf" if field == "generated_report_pdf" else "generated_report_pdf"
+    pdf_bytes, from_text = load_pdf_column(db, report_id, field)
+    # Debug: log size and magic
+    try:
+        first8 = (pdf_bytes or b"")[:8]
+        print(f"[structured_report] id={report_id} type={type} bytes={0 if not pdf_bytes else len(pdf_bytes)} magic={first8!r}")
+    except Exception:
+        pass
+    updated = False
+    if from_text and is_pdf(pdf_bytes):
+        # Lazily normalize rows the trigger could not decode
+        try:
+            store_pdf_bin(db, report_id, field, pdf_bytes)
+            db.commit()
+            updated = True
+        except Exception as e:
+            db.rollback()
+            print(f"[structured_report] bin write-back failed id={report_id}: {e}")
+    # If still invalid or tiny, fetch the alternate column
+    if not pdf_bytes or len(pdf_bytes) < 1024 or not pdf_bytes.startswith(b"%PDF"):
+        try_alt, _ = load_pdf_column(db, report_id, alt_field)
+        if is_pdf(try_alt):
+            pdf_bytes = try_alt
+            print("[structured_report] falling back to alternate column")
+    return pdf_bytes, updated
+
+
+def _structured_pdf_response(request: Request, db: Session, meta, type: str, disposition: str):
+    report_id = int(meta["id"])
+    # The row version changes whenever the PDF columns are rewritten (trigger, backfill, lazy
+    # write-back), so it is the only validator; created_at would make If-Modified-Since lie.
+    etag = f'"sr-{report_id}-{type}-{meta.get("row_version")}"'
+    headers = {
+        "content-disposition": ("attachment" if disposition == "attachment" else "inline") + f"; filename=report-{report_id}-{type}.pdf",
+        # Private (authenticated) content; clients keep it but revalidate with the ETag
+        "cache-control": "private, no-cache",
+    }
+    # Answer revalidations from metadata alone, before touching the blob
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={**headers, "etag": etag})
+
+    key = (report_id, type, str(meta.get("row_version")))
+    cached = pdf_cache.get(key)
+    if cached is None:
+        pdf_bytes, updated = _decode_structured_pdf(db, report_id, type)
+        if not pdf_bytes:
+            raise HTTPException(status_code=404, detail="PDF not available yet")
+        if updated:
+            # The write-back bumped the row version: key and validate against the new one
+            fresh = _structured_report_meta(db, report_id)
+            if fresh:
+                etag = f'"sr-{report_id}-{type}-{fresh.get("row_version")}"'
+                key = (report_id, type, str(fresh.get("row_version")))
+        pdf_cache.put(key, pdf_bytes)
+        cached = pdf_bytes
+    headers["etag"] = etag
+    use_range = range_allowed(request, etag)
+    if not isinstance(cached, bytes):
+        # Disk tier: stream the handle opened by the cache
+        return file_response(request, cached, headers, use_range, "application/pdf")
+    return bytes_response(request, cached, headers, use_range, "application/pdf")
+
+
 @router.get("/{report_id}/download")
 def download_structured_report(
     report_id: int,
+    request: Request,
     type: str = Query("generated", pattern="^(original|generated)$"),
     disposition: str = Query("inline", pattern="^(inline|attachment)$"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    # fetch row, authorize via patient/user
-    row = db.execute(text("select * from structured_reports where id = :id"), {"id": report_id}).mappings().first()
+    # fetch row metadata, authorize via patient/user
+    row = _structured_report_meta(db, report_id)
     if not row:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -351,45 +553,13 @@ def download_structured_report(
         if not ALLOW_DEMO_REPORTS:
             raise HTTPException(status_code=403, detail="Not allowed for this report")
 
-    field = "generated_report_pdf" if type == "generated" else "original_report_pdf"
-    payload = row.get(field)
-    alt = row.get("original_report_pdf" if field == "generated_report_pdf" else "generated_report_pdf")
-    pdf_bytes = _b64_or_raw_to_bytes(payload)
-    # Debug: log size and magic
-    try:
-        first8 = (pdf_bytes or b"")[:8]
-        print(f"[structured_report] id={report_id} type={type} bytes={0 if not pdf_bytes else len(pdf_bytes)} magic={first8!r}")
-    except Exception:
-        pass
-    # If not a PDF yet but payload string begins/ends with quotes, strip and retry
-    if (not pdf_bytes or not pdf_bytes.startswith(b"%PDF")) and isinstance(payload, str):
-        sp = payload.strip()
-        if (sp.startswith('"') and sp.endswith('"')) or (sp.startswith("'") and sp.endswith("'")):
-            stripped = sp[1:-1]
-            retry = _b64_or_raw_to_bytes(stripped)
-            if retry and retry.startswith(b"%PDF"):
-                pdf_bytes = retry
-    # If still invalid or tiny, try alternate column automatically
-    if (not pdf_bytes or len(pdf_bytes) < 1024 or not pdf_bytes.startswith(b"%PDF")) and alt is not None:
-        try_alt = _b64_or_raw_to_bytes(alt)
-        if try_alt and try_alt.startswith(b"%PDF"):
-            pdf_bytes = try_alt
-            print("[structured_report] falling back to alternate column")
-
-    if not pdf_bytes:
-        raise HTTPException(status_code=404, detail="PDF not available yet")
-
-    headers = {"content-type": "application/pdf"}
-    if disposition == "attachment":
-        headers["content-disposition"] = f"attachment; filename=report-{report_id}-{type}.pdf"
-    else:
-        headers["content-disposition"] = f"inline; filename=report-{report_id}-{type}.pdf"
-    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    return _structured_pdf_response(request, db, row, type, disposition)
 
 
 @router.get("/{report_id}/public")
 def download_structured_report_public(
     report_id: int,
+    request: Request,
     type: str = Query("generated", pattern="^(original|generated)$"),
     disposition: str = Query("inline", pattern="^(inline|attachment)$"),
     db: Session = Depends(get_db),
@@ -399,15 +569,7 @@ def download_structured_report_public(
     """
     if not ALLOW_DEMO_REPORTS:
         raise HTTPException(status_code=403, detail="Public access disabled")
-    row = db.execute(text("select * from structured_reports where id = :id"), {"id": report_id}).mappings().first()
+    row = _structured_report_meta(db, report_id)
     if not row:
         raise HTTPException(status_code=404, detail="Report not found")
-    field = "generated_report_pdf" if type == "generated" else "original_report_pdf"
-    payload = row.get(field)
-    alt = row.get("original_report_pdf" if field == "generated_report_pdf" else "generated_report_pdf")
-    pdf_bytes = _b64_or_raw_to_bytes(payload) or _b64_or_raw_to_bytes(alt)
-    if not pdf_bytes:
-        raise HTTPException(status_code=404, detail="PDF not available yet")
-    headers = {"content-type": "application/pdf"}
-    headers["content-disposition"] = ("attachment" if disposition == "attachment" else "inline") + f"; filename=report-{report_id}-{type}.pdf"
-    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    return _structured_pdf_response(request, db, row, type, disposition)
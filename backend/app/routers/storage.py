@@ -1,38 +1,23 @@
-import os
 from fastapi import APIRouter, HTTPException, Query
 
+from ..utils import object_storage
+from ..utils.object_storage import ObjectStorageError
+
 router = APIRouter(prefix="/storage", tags=["storage"])
 
 
 def _get_s3_client():
     try:
-        import boto3  # type: ignore
-    except Exception as exc:  # pragma: no cover - import-time
-        raise HTTPException(status_code=500, detail=f"boto3 not installed: {exc}")
-
-    endpoint = os.getenv("E2E_HOST_ENDPOINT") or "objectstore.e2enetworks.net"
-    access_key = os.getenv("E2E_ACCESS_KEY")
-    secret_key = os.getenv("E2E_SECRET_KEY")
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=500, detail="Object storage credentials not configured")
-
-    session = boto3.session.Session()
-    s3 = session.client(
-        "s3",
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        endpoint_url=f"https://{endpoint}",
-        config=boto3.session.Config(signature_version="s3v4"),
-        region_name=os.getenv("E2E_REGION") or "auto",
-    )
-    return s3
+        return object_storage.get_s3_client()
+    except ObjectStorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
 
 
 def _bucket_name() -> str:
-    name = os.getenv("E2E_BUCKET_NAME")
-    if not name:
-        raise HTTPException(status_code=500, detail="E2E_BUCKET_NAME not configured")
-    return name
+    try:
+        return object_storage.bucket_name()
+    except ObjectStorageError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
 
 
 @router.post("/create-prefix")
@@ -130,6 +130,10 @@ class ReportOut(ReportCreate):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ReportSyncRequest(BaseModel):
+    file_ids: list[int] = Field(default_factory=list, max_length=500)
+
+
 class PaymentCreate(BaseModel):
     case_id: int
     order_id: str
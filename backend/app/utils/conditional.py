@@ -0,0 +1,111 @@
+"""Validators, conditional GET and single byte-range handling for downloadable blobs."""
+
+import os
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" matches "x"
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True when the client's cached copy is current (If-None-Match)."""
+    inm = request.headers.get("if-none-match")
+    return inm is not None and _etag_matches(inm, etag)
+
+
+def range_allowed(request: Request, etag: str) -> bool:
+    """Honour Range only if If-Range (when sent) still names the current representation."""
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range.strip() == etag
+
+
+def parse_single_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse `bytes=a-b` / `bytes=a-` / `bytes=-n` into an inclusive (start, end).
+
+    Returns None for headers we don't serve partially (other units, multiple ranges, garbage);
+    raises ValueError when the range cannot be satisfied.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+        return None
+    if first == "":
+        if not last or int(last) == 0:
+            raise ValueError("empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def bytes_response(request: Request, data: bytes, headers: dict, use_range: bool, media_type: str) -> Response:
+    """200, 206 or 416 for an in-memory body."""
+    headers = {**headers, "accept-ranges": "bytes"}
+    size = len(data)
+    http_range = request.headers.get("range")
+    if http_range and use_range:
+        try:
+            rng = parse_single_range(http_range, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        if rng is not None:
+            start, end = rng
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+FILE_CHUNK_BYTES = 256 * 1024
+
+
+def _file_chunks(fh, start: int, length: int):
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(FILE_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def file_response(request: Request, fh, headers: dict, use_range: bool, media_type: str) -> Response:
+    """200, 206 or 416 streamed from an already-open binary file, which is closed afterwards."""
+    headers = {**headers, "accept-ranges": "bytes"}
+    size = os.fstat(fh.fileno()).st_size
+    start, end, status = 0, size - 1, 200
+    http_range = request.headers.get("range")
+    if http_range and use_range:
+        try:
+            rng = parse_single_range(http_range, size)
+        except ValueError:
+            fh.close()
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        if rng is not None:
+            start, end = rng
+            status = 206
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+    headers["content-length"] = str(end - start + 1)
+    return StreamingResponse(
+        _file_chunks(fh, start, end - start + 1),
+        status_code=status,
+        media_type=media_type,
+        headers=headers,
+        # Also close if the body is never iterated (client gone)
+        background=BackgroundTask(fh.close),
+    )
@@ -0,0 +1,210 @@
+"""Change events for files, cases and reports.
+
+Writers call `emit(db, event, ...)` (or the emit_* helpers) before committing. On Postgres the
+event is sent with NOTIFY inside the writer's transaction, so it is only delivered if the change
+commits, and every process relays it to its local subscribers through one LISTEN connection.
+Other databases (local dev) deliver in-process immediately.
+
+Subscribers (the `/events` SSE stream, report long-polls) use `subscribe(*topics)`, which yields
+an asyncio.Queue. `publish` is safe to call from sync endpoints running in the threadpool.
+"""
+
+import asyncio
+import json
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..database import engine
+from .report_mirror import report_pdf_url
+
+EVENT_QUEUE_SIZE = 100
+NOTIFY_CHANNEL = "app_events"
+LISTEN_RETRY_SECONDS = 5
+
+_subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+
+def _put(q: asyncio.Queue, payload) -> None:
+    try:
+        q.put_nowait(payload)
+    except asyncio.QueueFull:
+        # Slow consumer: drop rather than block publishers
+        pass
+
+
+def publish(topic: str, payload: dict) -> None:
+    """Deliver to subscribers in this process."""
+    for loop, q in list(_subscribers.get(topic, ())):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            _put(q, payload)
+        else:
+            try:
+                loop.call_soon_threadsafe(_put, q, payload)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
+
+
+@contextmanager
+def subscribe(*topics: str):
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=EVENT_QUEUE_SIZE))
+    for t in topics:
+        _subscribers.setdefault(t, set()).add(entry)
+    try:
+        yield entry[1]
+    finally:
+        for t in topics:
+            subs = _subscribers.get(t)
+            if subs is not None:
+                subs.discard(entry)
+                if not subs:
+                    _subscribers.pop(t, None)
+
+
+def file_topic(file_id: int) -> str:
+    return f"file:{file_id}"
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _pg() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def emit(db: Session, event: dict, user_id: int | None = None, file_id: int | None = None) -> None:
+    """Queue `event` for the user's and/or file's topics; delivered when `db` commits (Postgres)."""
+    topics = []
+    if user_id is not None:
+        topics.append(user_topic(user_id))
+    if file_id is not None:
+        topics.append(file_topic(file_id))
+    if not topics:
+        return
+    if _pg():
+        db.execute(
+            text("select pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": json.dumps({"topics": topics, "event": event}, default=str)},
+        )
+    else:
+        for t in topics:
+            publish(t, event)
+
+
+def _case_user_id(db: Session, case) -> int | None:
+    from .. import models
+    patient = db.get(models.Patient, case.patient_id) if case.patient_id else None
+    return patient.user_id if patient else None
+
+
+def emit_file_status(db: Session, file_rec) -> None:
+    emit(
+        db,
+        {"type": "file", "file_id": file_rec.id, "case_id": file_rec.case_id, "status": file_rec.status},
+        user_id=file_rec.user_id,
+        file_id=file_rec.id,
+    )
+
+
+def emit_case_status(db: Session, case, user_id: int | None = None) -> None:
+    emit(
+        db,
+        {"type": "case", "case_id": case.id, "status": case.status},
+        user_id=user_id if user_id is not None else _case_user_id(db, case),
+    )
+
+
+def emit_report(db: Session, report_rec, file_rec) -> None:
+    """Announce a stored report; `report_rec` needs id, pdf_url and pdf_object_key."""
+    emit(
+        db,
+        {"type": "report", "file_id": file_rec.id, "case_id": file_rec.case_id, "pdf_url": report_pdf_url(report_rec, mirror=False)},
+        user_id=file_rec.user_id,
+        file_id=file_rec.id,
+    )
+
+
+class _NotifyListener:
+    """Relays Postgres NOTIFY payloads on NOTIFY_CHANNEL to local subscribers."""
+
+    def __init__(self):
+        self._conn = None
+        self._task: asyncio.Task | None = None
+
+    def _connect(self):
+        raw = engine.raw_connection()
+        # Keep the LISTEN connection out of the pool for the life of the process
+        raw.detach()
+        conn = raw.driver_connection
+        conn.set_isolation_level(0)  # autocommit
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return conn
+
+    def _drain(self) -> None:
+        self._conn.poll()
+        while self._conn.notifies:
+            note = self._conn.notifies.pop(0)
+            try:
+                data = json.loads(note.payload)
+            except Exception:
+                continue
+            for topic in data.get("topics") or []:
+                publish(topic, data.get("event") or {})
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            broken = loop.create_future()
+
+            def _on_readable():
+                try:
+                    self._drain()
+                except Exception as exc:
+                    if not broken.done():
+                        broken.set_exception(exc)
+
+            try:
+                self._conn = self._connect()
+                loop.add_reader(self._conn.fileno(), _on_readable)
+                await broken
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            finally:
+                self._close()
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    def _close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._conn.fileno())
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def start(self) -> None:
+        if _pg() and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+listener = _NotifyListener()
@@ -0,0 +1,126 @@
+"""Application-scoped async HTTP client for all 5C network calls.
+
+The client is created once in the FastAPI lifespan (see main.py) so vendor requests reuse warm
+keep-alive / HTTP/2 connections instead of paying TCP+TLS setup per request.
+"""
+
+import os
+
+import httpx
+
+from .fivec_gateway import gateway, upload_gateway
+
+API_BASE = os.getenv("FIVEC_API_BASE", "https://api.5cnetwork.com")
+API_AUTH = os.getenv("FIVEC_API_AUTH")  # e.g., "Bearer <token>" or raw token if API expects basic token
+# Shared secret for signed report events pushed by 5C; when set, polling becomes a slow fallback
+FIVEC_WEBHOOK_SECRET = os.getenv("FIVEC_WEBHOOK_SECRET")
+
+FIVEC_HTTP_TIMEOUT = float(os.getenv("FIVEC_HTTP_TIMEOUT_SECONDS", "30"))
+FIVEC_HTTP_MAX_CONNECTIONS = int(os.getenv("FIVEC_HTTP_MAX_CONNECTIONS", "100"))
+FIVEC_HTTP_MAX_KEEPALIVE = int(os.getenv("FIVEC_HTTP_MAX_KEEPALIVE", "20"))
+FIVEC_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("FIVEC_HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+FIVEC_HTTP2 = os.getenv("FIVEC_HTTP2", "true").lower() == "true"
+
+_client: httpx.AsyncClient | None = None
+_stats = {"requests": 0, "errors": 0, "in_flight": 0}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=FIVEC_HTTP_TIMEOUT,
+        http2=FIVEC_HTTP2 and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=FIVEC_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=FIVEC_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=FIVEC_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def startup() -> None:
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def shutdown() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily when running outside the app lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def auth_headers() -> dict:
+    headers = {}
+    if API_AUTH:
+        headers["Authorization"] = API_AUTH
+    return headers
+
+
+async def _send(gw, method: str, url: str, **kwargs) -> httpx.Response:
+    headers = {**auth_headers(), **(kwargs.pop("headers", None) or {})}
+    _stats["requests"] += 1
+    _stats["in_flight"] += 1
+    try:
+        return await gw.call(lambda: get_client().request(method, url, headers=headers, **kwargs))
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request on the shared client with 5C auth, pool accounting and the vendor gateway.
+
+    Raises `VendorUnavailable` (503) when the gateway sheds the call.
+    """
+    return await _send(gateway, method, url, **kwargs)
+
+
+async def upload(url: str, **kwargs) -> httpx.Response:
+    """POST a DICOM upload to the 5C router; like `request`, but limited by the upload gateway."""
+    return await _send(upload_gateway, "POST", url, **kwargs)
+
+
+async def get_json(url: str, params: dict | None = None):
+    """GET `url` and return (status_code, parsed JSON or None)."""
+    r = await request("GET", url, params=params)
+    try:
+        return r.status_code, r.json()
+    except Exception:
+        return r.status_code, None
+
+
+def pool_stats() -> dict:
+    """Request counters plus a best-effort view of the underlying connection pool."""
+    out = {
+        **_stats,
+        "http2": bool(_client is not None and FIVEC_HTTP2 and _http2_available()),
+        "max_connections": FIVEC_HTTP_MAX_CONNECTIONS,
+        "max_keepalive": FIVEC_HTTP_MAX_KEEPALIVE,
+    }
+    try:
+        conns = _client._transport._pool.connections  # type: ignore[union-attr]
+        out["connections"] = len(conns)
+        out["idle_connections"] = sum(1 for c in conns if c.is_idle())
+    except Exception:
+        out["connections"] = None
+        out["idle_connections"] = None
+    return out
@@ -0,0 +1,217 @@
+"""Protective gateway in front of every 5C network call.
+
+Combines an adaptive token-bucket rate limit, a cap on concurrent requests and a circuit breaker.
+When 5C browns out, callers fail fast with `VendorUnavailable` (HTTP 503) instead of queueing
+behind 30-second timeouts.
+
+DICOM uploads go to a different host (the 5C router) and hold a request for minutes, so they
+have their own gateway (`upload_gateway`): a slow or failing router can't use up the API's
+slots or open its breaker, and API brownouts don't block uploads.
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+from fastapi import HTTPException
+
+FIVEC_RATE_PER_SECOND = float(os.getenv("FIVEC_RATE_PER_SECOND", "20"))
+FIVEC_RATE_MIN_PER_SECOND = float(os.getenv("FIVEC_RATE_MIN_PER_SECOND", "1"))
+FIVEC_RATE_BURST = int(os.getenv("FIVEC_RATE_BURST", "40"))
+FIVEC_MAX_CONCURRENCY = int(os.getenv("FIVEC_MAX_CONCURRENCY", "32"))
+# How long a caller may wait for a token / concurrency slot before failing fast
+FIVEC_MAX_WAIT_SECONDS = float(os.getenv("FIVEC_MAX_WAIT_SECONDS", "2"))
+FIVEC_BREAKER_FAILURES = int(os.getenv("FIVEC_BREAKER_FAILURES", "5"))
+FIVEC_BREAKER_RESET_SECONDS = float(os.getenv("FIVEC_BREAKER_RESET_SECONDS", "30"))
+
+# Limits for the DICOM upload router
+FIVEC_UPLOAD_RATE_PER_SECOND = float(os.getenv("FIVEC_UPLOAD_RATE_PER_SECOND", "10"))
+FIVEC_UPLOAD_RATE_MIN_PER_SECOND = float(os.getenv("FIVEC_UPLOAD_RATE_MIN_PER_SECOND", "1"))
+FIVEC_UPLOAD_RATE_BURST = int(os.getenv("FIVEC_UPLOAD_RATE_BURST", "20"))
+FIVEC_UPLOAD_MAX_CONCURRENCY = int(os.getenv("FIVEC_UPLOAD_MAX_CONCURRENCY", "16"))
+# Uploads are long, so waiting for a slot is worth more than failing fast
+FIVEC_UPLOAD_MAX_WAIT_SECONDS = float(os.getenv("FIVEC_UPLOAD_MAX_WAIT_SECONDS", "30"))
+FIVEC_UPLOAD_BREAKER_FAILURES = int(os.getenv("FIVEC_UPLOAD_BREAKER_FAILURES", "5"))
+FIVEC_UPLOAD_BREAKER_RESET_SECONDS = float(os.getenv("FIVEC_UPLOAD_BREAKER_RESET_SECONDS", "30"))
+
+
+class VendorUnavailable(HTTPException):
+    """5C is unavailable or we are shedding load; surfaces to clients as 503."""
+
+    def __init__(self, reason: str, retry_after: float | None = None):
+        headers = {"Retry-After": str(max(int(retry_after or 0), 1))} if retry_after is not None else None
+        super().__init__(status_code=503, detail=f"5C network unavailable: {reason}", headers=headers)
+        self.reason = reason
+
+
+class TokenBucket:
+    """Token bucket whose refill rate backs off multiplicatively on throttling and recovers additively."""
+
+    def __init__(self, rate: float, burst: int, min_rate: float):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait: float) -> None:
+        deadline = time.monotonic() + max_wait
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise VendorUnavailable("rate limited", retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self) -> None:
+        self.rate = max(self.min_rate, self.rate * 0.5)
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures; open -> half_open after the reset timeout;
+    a single half-open probe closes it again on success or re-opens it on failure."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """Raise if calls are not allowed; return True if this call is the half-open probe."""
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise VendorUnavailable("circuit open", retry_after=remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                raise VendorUnavailable("circuit half-open", retry_after=1)
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Give back a probe reservation that never reached the vendor."""
+        self._probe_in_flight = False
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self.state = "closed"
+        self._probe_in_flight = False
+
+    def on_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        out = {"state": self.state, "consecutive_failures": self.failures}
+        if self.state == "open":
+            out["retry_in_seconds"] = round(max(self.reset_timeout - (time.monotonic() - self.opened_at), 0), 1)
+        return out
+
+
+class VendorGateway:
+    def __init__(
+        self,
+        rate: float = FIVEC_RATE_PER_SECOND,
+        burst: int = FIVEC_RATE_BURST,
+        min_rate: float = FIVEC_RATE_MIN_PER_SECOND,
+        max_concurrency: int = FIVEC_MAX_CONCURRENCY,
+        max_wait: float = FIVEC_MAX_WAIT_SECONDS,
+        breaker_failures: int = FIVEC_BREAKER_FAILURES,
+        breaker_reset: float = FIVEC_BREAKER_RESET_SECONDS,
+    ):
+        self.bucket = TokenBucket(rate, burst, min_rate)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def call(self, send):
+        """Run `send()` (returning an httpx.Response) under rate limit, concurrency cap and breaker.
+
+        Only transport errors and 5xx responses count as vendor failures.
+        """
+        probe = False
+        try:
+            probe = self.breaker.before_call()
+            await self.bucket.acquire(self.max_wait)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                raise VendorUnavailable("too many concurrent requests", retry_after=1)
+        except BaseException as exc:
+            if isinstance(exc, VendorUnavailable):
+                self.rejected += 1
+            if probe:
+                self.breaker.release_probe()
+            raise
+        self.in_flight += 1
+        try:
+            resp = await send()
+        except httpx.TransportError:
+            self.breaker.on_failure()
+            self.bucket.on_throttle()
+            raise
+        except BaseException:
+            # Cancelled, or failed on our side (e.g. reading the request body): says nothing
+            # about the vendor's health
+            if probe:
+                self.breaker.release_probe()
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        if resp.status_code == 429:
+            # Vendor is up but asking us to slow down: back off without tripping the breaker
+            self.bucket.on_throttle()
+            self.breaker.on_success()
+        elif resp.status_code >= 500:
+            self.bucket.on_throttle()
+            self.breaker.on_failure()
+        else:
+            self.bucket.on_success()
+            self.breaker.on_success()
+        return resp
+
+    def snapshot(self) -> dict:
+        return {
+            "circuit": self.breaker.snapshot(),
+            "rate_per_second": round(self.bucket.rate, 2),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rejected": self.rejected,
+        }
+
+
+gateway = VendorGateway()
+upload_gateway = VendorGateway(
+    rate=FIVEC_UPLOAD_RATE_PER_SECOND,
+    burst=FIVEC_UPLOAD_RATE_BURST,
+    min_rate=FIVEC_UPLOAD_RATE_MIN_PER_SECOND,
+    max_concurrency=FIVEC_UPLOAD_MAX_CONCURRENCY,
+    max_wait=FIVEC_UPLOAD_MAX_WAIT_SECONDS,
+    breaker_failures=FIVEC_UPLOAD_BREAKER_FAILURES,
+    breaker_reset=FIVEC_UPLOAD_BREAKER_RESET_SECONDS,
+)
@@ -0,0 +1,97 @@
+"""Single-pass key extraction from nested vendor JSON.
+
+5C responses nest the fields we need (pdf url, study ids, timestamps) at varying depths and
+under several aliases. A KeyExtractor is compiled once from named alias groups and resolves all
+of them in one depth-first walk of the payload, with the same first-match rules as the old
+per-key `_extract`: a dict's own keys win over its children, earlier aliases win within a dict,
+and children are searched in order. A matching key holding None ends the search for that group
+in that subtree (siblings are still searched) unless `skip_none` is set.
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Mapping, Sequence
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=4096)
+def normalize_key(key: str) -> str:
+    """Case- and punctuation-insensitive form: "StudyInstanceUID" / "study_instance_uid" -> "studyinstanceuid"."""
+    return "".join(ch for ch in key.lower() if ch.isalnum())
+
+
+class KeyExtractor:
+    def __init__(
+        self,
+        groups: Mapping[str, Sequence[str]],
+        normalize_keys: bool = False,
+        skip_none: bool = False,
+        accept: Mapping[str, Callable[[Any], bool]] | None = None,
+    ):
+        self.names = list(groups)
+        self.normalize_keys = normalize_keys
+        self.skip_none = skip_none
+        self._accept = [(accept or {}).get(name) for name in self.names]
+        # alias -> [(group index, priority within group)]
+        self._index: dict[str, list[tuple[int, int]]] = {}
+        for gi, name in enumerate(self.names):
+            for pri, key in enumerate(groups[name]):
+                k = normalize_key(key) if normalize_keys else key
+                self._index.setdefault(k, []).append((gi, pri))
+
+    def extract(self, payload: Any) -> dict[str, Any]:
+        """Return {group name: first matching value or None} after one walk of `payload`."""
+        found = [_MISSING] * len(self.names)
+        self._walk(payload, list(range(len(self.names))), found)
+        return {name: (None if v is _MISSING else v) for name, v in zip(self.names, found)}
+
+    def _walk(self, node: Any, active: list[int], found: list) -> None:
+        if not node:
+            return
+        if isinstance(node, dict):
+            best: dict[int, tuple[int, Any]] = {}
+            index = self._index
+            for k, v in node.items():
+                if self.normalize_keys:
+                    if not isinstance(k, str):
+                        continue
+                    k = normalize_key(k)
+                hits = index.get(k)
+                if not hits:
+                    continue
+                for gi, pri in hits:
+                    if gi not in active or (gi in best and best[gi][0] <= pri):
+                        continue
+                    if v is None and self.skip_none:
+                        continue
+                    check = self._accept[gi]
+                    if check is not None and v is not None and not check(v):
+                        continue
+                    best[gi] = (pri, v)
+            if best:
+                for gi, (_, v) in best.items():
+                    if v is not None:
+                        found[gi] = v
+                # Resolved groups, and groups whose key is present but None, stop here
+                active = [gi for gi in active if gi not in best]
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            return
+        for child in children:
+            if not active:
+                return
+            if isinstance(child, (dict, list)):
+                self._walk(child, active, found)
+                active = [gi for gi in active if found[gi] is _MISSING]
+
+
+@lru_cache(maxsize=256)
+def _single(keys: tuple[str, ...]) -> KeyExtractor:
+    return KeyExtractor({"value": keys})
+
+
+def extract_first(value: Any, keys: Sequence[str]) -> Any:
+    """First value found under any of `keys` (in priority order), or None."""
+    return _single(tuple(keys)).extract(value)["value"]
@@ -0,0 +1,129 @@
+"""Leader election for periodic background loops.
+
+Every uvicorn worker / container replica starts the same background loops. A loop wrapped in
+`run_as_leader` only runs in the process holding a Postgres session-level advisory lock for the
+loop's name; the others retry every few seconds and take over once the holder's connection
+goes away (crash, restart, lost network).
+"""
+
+import asyncio
+import hashlib
+import os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from ..database import engine
+
+LEADER_RETRY_SECONDS = int(os.getenv("LEADER_RETRY_SECONDS", "5"))
+LEADER_RENEW_SECONDS = int(os.getenv("LEADER_RENEW_SECONDS", "5"))
+
+_lock_engine = None
+
+
+def _get_lock_engine():
+    """Unpooled engine for lock connections, so held leases don't eat into the request pool."""
+    global _lock_engine
+    if _lock_engine is None:
+        _lock_engine = create_engine(engine.url, poolclass=NullPool)
+    return _lock_engine
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a loop name."""
+    digest = hashlib.sha1(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class LeaderLease:
+    """Advisory-lock lease held on a dedicated connection for as long as that connection lives.
+
+    Methods block on the database; call them from a worker thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = lock_key(name)
+        self._conn = None
+        self._always_leader = engine.dialect.name != "postgresql"
+
+    @property
+    def held(self) -> bool:
+        return self._always_leader or self._conn is not None
+
+    def try_acquire(self) -> bool:
+        if self.held:
+            return True
+        try:
+            conn = _get_lock_engine().connect()
+        except Exception:
+            return False
+        try:
+            got = conn.execute(text("select pg_try_advisory_lock(:k)"), {"k": self.key}).scalar()
+            # Do not sit idle in a transaction; the session lock survives the commit
+            conn.commit()
+        except Exception:
+            conn.close()
+            return False
+        if got:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def renew(self) -> bool:
+        """Confirm the lock connection is still alive; a live session still owns its lock."""
+        if self._always_leader:
+            return True
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text("select 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            self._drop()
+            return False
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("select pg_advisory_unlock(:k)"), {"k": self.key})
+            self._conn.commit()
+        except Exception:
+            pass
+        self._drop()
+
+    def _drop(self) -> None:
+        try:
+            if self._conn is not None:
+                # Unpooled: closing ends the session, and with it the lock
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+async def run_as_leader(name: str, loop_factory) -> None:
+    """Run `loop_factory()` only while this process holds leadership for `name`."""
+    lease = LeaderLease(name)
+    while True:
+        # Lock calls block on the database, so keep them off the event loop
+        if not await asyncio.to_thread(lease.try_acquire):
+            await asyncio.sleep(LEADER_RETRY_SECONDS)
+            continue
+        print(f"[leader] acquired leadership for {name}")
+        task = asyncio.create_task(loop_factory())
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=LEADER_RENEW_SECONDS)
+                if not task.done() and not await asyncio.to_thread(lease.renew):
+                    print(f"[leader] lost leadership for {name}")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await asyncio.to_thread(lease.release)
+        await asyncio.sleep(LEADER_RETRY_SECONDS)
@@ -0,0 +1,90 @@
+"""Streaming multipart/form-data bodies for proxying files to 5C.
+
+httpx's `files=` builds the whole body from bytes in memory. These helpers instead yield the
+part header, the file in fixed-size chunks and the closing boundary, so an upload of any size
+holds one chunk at a time. When the size is known the exact Content-Length is sent (no chunked
+transfer encoding).
+"""
+
+import asyncio
+import os
+import secrets
+from typing import AsyncIterator, Awaitable, Callable
+
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+
+def _quote(value: str) -> str:
+    # Same escaping httpx applies to form-data names/filenames
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartFileBody:
+    """One file part, read through `read(n)` (async) when the body is iterated."""
+
+    def __init__(
+        self,
+        field: str,
+        filename: str,
+        content_type: str,
+        read: Callable[[int], Awaitable[bytes]],
+        size: int | None = None,
+        chunk_size: int = UPLOAD_CHUNK_BYTES,
+    ):
+        self.boundary = secrets.token_hex(16)
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(field)}"; filename="{_quote(filename)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self._read = read
+        self.size = size
+        self.chunk_size = chunk_size
+
+    @property
+    def headers(self) -> dict:
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if self.size is not None:
+            headers["Content-Length"] = str(len(self._head) + self.size + len(self._tail))
+        return headers
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        while True:
+            chunk = await self._read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
+
+
+def upload_file_body(field: str, upload, content_type: str | None = None) -> MultipartFileBody:
+    """Body for a FastAPI UploadFile (already spooled to disk by the multipart parser)."""
+    size = getattr(upload, "size", None)
+    if size is None:
+        try:
+            pos = upload.file.tell()
+            upload.file.seek(0, os.SEEK_END)
+            size = upload.file.tell() - pos
+            upload.file.seek(pos)
+        except Exception:
+            size = None
+    return MultipartFileBody(
+        field,
+        upload.filename or "upload.dcm",
+        content_type or upload.content_type or "application/dicom",
+        upload.read,
+        size=size,
+    )
+
+
+def fileobj_body(field: str, filename: str, fileobj, content_type: str, size: int | None = None) -> MultipartFileBody:
+    """Body for a blocking file object (e.g. a zip member); reads run in a worker thread."""
+    return MultipartFileBody(
+        field,
+        filename,
+        content_type,
+        lambda n: asyncio.to_thread(fileobj.read, n),
+        size=size,
+    )
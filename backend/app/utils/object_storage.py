@@ -0,0 +1,78 @@
+"""E2E object storage (S3-compatible) client shared by the storage routes and report mirroring.
+
+E2E_HOST_ENDPOINT may carry a scheme (e.g. http://localhost:9000 for a local MinIO stand-in);
+a bare host means https.
+"""
+
+import os
+import threading
+
+E2E_HOST_ENDPOINT = os.getenv("E2E_HOST_ENDPOINT") or "objectstore.e2enetworks.net"
+E2E_ADDRESSING_STYLE = os.getenv("E2E_ADDRESSING_STYLE") or "auto"  # "path" for MinIO
+
+
+class ObjectStorageError(Exception):
+    pass
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def endpoint_url() -> str:
+    if "://" in E2E_HOST_ENDPOINT:
+        return E2E_HOST_ENDPOINT.rstrip("/")
+    return f"https://{E2E_HOST_ENDPOINT}"
+
+
+def is_configured() -> bool:
+    return bool(os.getenv("E2E_ACCESS_KEY") and os.getenv("E2E_SECRET_KEY") and os.getenv("E2E_BUCKET_NAME"))
+
+
+def get_s3_client():
+    """Return a shared boto3 S3 client (boto3 clients are thread-safe)."""
+    global _client
+    if _client is not None:
+        return _client
+    try:
+        import boto3  # type: ignore
+        from botocore.config import Config  # type: ignore
+    except Exception as exc:  # pragma: no cover - import-time
+        raise ObjectStorageError(f"boto3 not installed: {exc}")
+
+    access_key = os.getenv("E2E_ACCESS_KEY")
+    secret_key = os.getenv("E2E_SECRET_KEY")
+    if not access_key or not secret_key:
+        raise ObjectStorageError("Object storage credentials not configured")
+
+    with _client_lock:
+        if _client is None:
+            session = boto3.session.Session()
+            _client = session.client(
+                "s3",
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                endpoint_url=endpoint_url(),
+                config=Config(signature_version="s3v4", s3={"addressing_style": E2E_ADDRESSING_STYLE}),
+                region_name=os.getenv("E2E_REGION") or "auto",
+            )
+    return _client
+
+
+def bucket_name() -> str:
+    name = os.getenv("E2E_BUCKET_NAME")
+    if not name:
+        raise ObjectStorageError("E2E_BUCKET_NAME not configured")
+    return name
+
+
+def presign_get(key: str, expires_in: int, disposition: str = "inline") -> str:
+    return get_s3_client().generate_presigned_url(
+        ClientMethod="get_object",
+        Params={
+            "Bucket": bucket_name(),
+            "Key": key,
+            "ResponseContentDisposition": disposition,
+        },
+        ExpiresIn=expires_in,
+    )
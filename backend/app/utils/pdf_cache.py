@@ -0,0 +1,129 @@
+"""Two-tier cache of decoded structured-report PDFs.
+
+Decoding the Text columns of `structured_reports` (base64 / data URL / escaped strings) is
+expensive for multi-megabyte reports, so the decoded bytes are cached per
+(report id, pdf type, row version). Small PDFs are kept in a byte-bounded in-memory LRU; all
+PDFs are also written to a size-bounded directory on disk and streamed from there, so repeat
+views cost a file read and no decode.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+PDF_CACHE_MEMORY_BYTES = int(os.getenv("PDF_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+PDF_CACHE_MEMORY_MAX_ITEM_BYTES = int(os.getenv("PDF_CACHE_MEMORY_MAX_ITEM_BYTES", str(4 * 1024 * 1024)))
+PDF_CACHE_DISK_BYTES = int(os.getenv("PDF_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "structured-report-pdfs")
+
+
+class PdfCache:
+    def __init__(self, memory_bytes: int, max_item_bytes: int, disk_bytes: int, directory: str):
+        self.memory_bytes = memory_bytes
+        self.max_item_bytes = max_item_bytes
+        self.disk_bytes = disk_bytes
+        self.directory = directory
+        self._mem: OrderedDict[tuple, bytes] = OrderedDict()
+        self._mem_size = 0
+        self._disk_size: int | None = None
+        # Sync endpoints run in the threadpool
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: tuple) -> str:
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.pdf")
+
+    def get(self, key: tuple):
+        """Return cached bytes (memory tier), an open binary file (disk tier) or None.
+
+        The disk file is opened under the lock, so eviction here (or unlinking by another
+        worker sharing the directory) can't remove it before the response reads it; the caller
+        closes the handle.
+        """
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            path = self._path(key)
+            try:
+                fh = open(path, "rb")
+            except OSError:
+                self.misses += 1
+                return None
+            try:
+                # Touch so disk eviction is least-recently-used
+                os.utime(path)
+            except OSError:
+                pass
+            self.disk_hits += 1
+            return fh
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) <= self.max_item_bytes:
+            with self._lock:
+                old = self._mem.pop(key, None)
+                if old is not None:
+                    self._mem_size -= len(old)
+                self._mem[key] = data
+                self._mem_size += len(data)
+                while self._mem_size > self.memory_bytes and self._mem:
+                    _, evicted = self._mem.popitem(last=False)
+                    self._mem_size -= len(evicted)
+        if self.disk_bytes <= 0 or len(data) > self.disk_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_size is not None:
+                self._disk_size += len(data)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            if self._disk_size is not None and self._disk_size <= self.disk_bytes:
+                return
+            try:
+                entries = []
+                for name in os.listdir(self.directory):
+                    if not name.endswith(".pdf"):
+                        continue
+                    st = os.stat(os.path.join(self.directory, name))
+                    entries.append((st.st_mtime, st.st_size, name))
+            except OSError:
+                return
+            total = sum(e[1] for e in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.disk_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_size = total
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._mem),
+            "memory_bytes": self._mem_size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+pdf_cache = PdfCache(PDF_CACHE_MEMORY_BYTES, PDF_CACHE_MEMORY_MAX_ITEM_BYTES, PDF_CACHE_DISK_BYTES, PDF_CACHE_DIR)
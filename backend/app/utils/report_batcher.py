@@ -0,0 +1,112 @@
+"""Coalesce 5C `/report/details` lookups into multi-id requests.
+
+Callers ask for one report id at a time; ids requested within a short window (and sharing the
+same extra query params) are sent together as `report_ids[]=a&report_ids[]=b...` in chunks of
+REPORT_DETAILS_BATCH_SIZE, and the response items are routed back to each caller by id.
+"""
+
+import asyncio
+import os
+
+from . import fivec_client
+from .fivec_client import API_BASE
+
+REPORT_DETAILS_BATCH_SIZE = int(os.getenv("REPORT_DETAILS_BATCH_SIZE", "50"))
+REPORT_DETAILS_BATCH_WINDOW_MS = int(os.getenv("REPORT_DETAILS_BATCH_WINDOW_MS", "50"))
+
+_ID_KEYS = ("id", "report_id", "study_id", "study_fk")
+
+
+def _items(data) -> list[dict]:
+    if isinstance(data, dict) and isinstance(data.get("data"), (list, dict)):
+        data = data["data"]
+    items = data if isinstance(data, list) else [data]
+    return [it for it in items if isinstance(it, dict)]
+
+
+def demux_details(report_ids: list[str], data) -> dict[str, dict]:
+    """Map each requested id to its item in a details response."""
+    items = _items(data)
+    if len(report_ids) == 1 and len(items) == 1:
+        # Single-id request: the lone item is the answer even if it is keyed differently
+        return {report_ids[0]: items[0]}
+    wanted = set(report_ids)
+    out: dict[str, dict] = {}
+    for item in items:
+        for k in _ID_KEYS:
+            v = item.get(k)
+            if v is not None and str(v) in wanted and str(v) not in out:
+                out[str(v)] = item
+                break
+    return out
+
+
+async def fetch_report_details(report_ids: list[str], params: dict | None = None) -> dict[str, dict]:
+    """Fetch details for many report ids with one request per chunk."""
+    out: dict[str, dict] = {}
+    for i in range(0, len(report_ids), REPORT_DETAILS_BATCH_SIZE):
+        chunk = report_ids[i:i + REPORT_DETAILS_BATCH_SIZE]
+        q = dict(params or {})
+        q["report_ids[]"] = chunk
+        code, data = await fivec_client.get_json(f"{API_BASE}/report/details", params=q)
+        if code == 200 and data:
+            out.update(demux_details(chunk, data))
+    return out
+
+
+class ReportDetailsBatcher:
+    """Collects concurrent single-id lookups and flushes them as batched requests."""
+
+    def __init__(self, batch_size: int = REPORT_DETAILS_BATCH_SIZE, window_ms: int = REPORT_DETAILS_BATCH_WINDOW_MS):
+        self.batch_size = max(batch_size, 1)
+        self.window = window_ms / 1000.0
+        self._pending: dict[tuple, dict[str, list[asyncio.Future]]] = {}
+        self._timers: dict[tuple, asyncio.TimerHandle] = {}
+        self._inflight: set[asyncio.Task] = set()
+
+    async def load(self, report_id: str, **params) -> dict | None:
+        """Return the details item for `report_id`, or None if the vendor has none."""
+        loop = asyncio.get_running_loop()
+        key = tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+        fut = loop.create_future()
+        bucket = self._pending.setdefault(key, {})
+        bucket.setdefault(str(report_id), []).append(fut)
+        if len(bucket) >= self.batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    async def load_many(self, report_ids: list[str], **params) -> list[dict]:
+        results = await asyncio.gather(*(self.load(rid, **params) for rid in report_ids))
+        return [r for r in results if r is not None]
+
+    def _flush(self, key: tuple) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        bucket = self._pending.pop(key, None)
+        if not bucket:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(dict(key), bucket))
+        # Keep a reference so the flush isn't garbage collected mid-flight
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, params: dict, bucket: dict[str, list[asyncio.Future]]) -> None:
+        try:
+            results = await fetch_report_details(list(bucket), params)
+        except Exception as exc:
+            for futs in bucket.values():
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_exception(exc)
+            return
+        for rid, futs in bucket.items():
+            for fut in futs:
+                if not fut.done():
+                    fut.set_result(results.get(rid))
+
+
+# Shared by the status refresher and the per-file report pollers
+report_details = ReportDetailsBatcher()
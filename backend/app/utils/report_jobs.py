@@ -0,0 +1,279 @@
+"""Durable report-polling jobs and the in-process worker pool that runs them.
+
+Each job polls 5C once for a file's report; if the PDF isn't ready it is rescheduled after
+REPORT_JOB_RETRY_SECONDS until REPORT_JOB_MAX_ATTEMPTS. Workers claim jobs with a lease
+(`locked_until`) using SKIP LOCKED, so every process can run a pool, and jobs whose worker
+died (restart, crash) are picked up again once the lease expires.
+
+All report polls (jobs, `/reports/sync/{file_id}`, `/reports/{file_id}/pdf`) go through
+`run_report_poll`: callers in the same process join the poll already in flight for a file, and
+the job row's lease keeps other processes from polling the same file at the same time.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from .single_flight import SingleFlight
+from . import events
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "4"))
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "18"))
+REPORT_JOB_RETRY_SECONDS = int(os.getenv("REPORT_JOB_RETRY_SECONDS", "10"))
+REPORT_JOB_LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", "120"))
+REPORT_JOB_IDLE_SECONDS = float(os.getenv("REPORT_JOB_IDLE_SECONDS", "2"))
+# Time allowed for one vendor check when waiting on another process's poll
+REPORT_POLL_ATTEMPT_SECONDS = float(os.getenv("REPORT_POLL_ATTEMPT_SECONDS", "15"))
+
+_ACTIVE = ("pending", "running")
+
+_flights = SingleFlight()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_report_poll(db: Session, file_id: int, delay_seconds: int = 0) -> models.ReportPollJob:
+    """Create (or re-arm) the polling job for a file. Caller commits."""
+    job = db.execute(
+        select(models.ReportPollJob).where(models.ReportPollJob.file_id == file_id)
+    ).scalar_one_or_none()
+    run_at = _now() + timedelta(seconds=delay_seconds)
+    if job is None:
+        job = models.ReportPollJob(file_id=file_id, status="pending", attempts=0, next_run_at=run_at)
+        db.add(job)
+    elif job.status not in _ACTIVE:
+        job.status = "pending"
+        job.attempts = 0
+        job.next_run_at = run_at
+        job.locked_until = None
+        job.last_error = None
+    return job
+
+
+def _claim_job() -> tuple[int, int] | None:
+    """Lease the next due job; returns (job_id, file_id) or None."""
+    db = SessionLocal()
+    try:
+        now = _now()
+        job = db.execute(
+            select(models.ReportPollJob)
+            .where(models.ReportPollJob.status.in_(_ACTIVE))
+            .where(models.ReportPollJob.next_run_at <= now)
+            .where(or_(models.ReportPollJob.locked_until.is_(None), models.ReportPollJob.locked_until < now))
+            .order_by(models.ReportPollJob.next_run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.rollback()
+            return None
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.locked_until = now + timedelta(seconds=REPORT_JOB_LEASE_SECONDS)
+        claimed = (job.id, job.file_id)
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _settle(job: models.ReportPollJob, found: bool, error: str | None) -> None:
+    job.locked_until = None
+    job.last_error = error
+    if found:
+        job.status = "done"
+    elif (job.attempts or 0) >= REPORT_JOB_MAX_ATTEMPTS:
+        job.status = "failed"
+    else:
+        job.status = "pending"
+        job.next_run_at = _now() + timedelta(seconds=REPORT_JOB_RETRY_SECONDS)
+
+
+def _finish_job(job_id: int, found: bool, error: str | None) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(models.ReportPollJob, job_id)
+        if job is None:
+            return
+        _settle(job, found, error)
+        db.commit()
+    finally:
+        db.close()
+
+
+def lease_file(file_id: int, lease_seconds: int) -> bool:
+    """Take the file's poll lease (its job row) for an inline poll. False if another worker holds it.
+
+    The job's status is left alone (the lease alone keeps workers off it); a row created just
+    to carry the lease is `idle`.
+    """
+    db = SessionLocal()
+    try:
+        now = _now()
+        until = now + timedelta(seconds=lease_seconds)
+        res = db.execute(
+            update(models.ReportPollJob)
+            .where(models.ReportPollJob.file_id == file_id)
+            .where(or_(models.ReportPollJob.locked_until.is_(None), models.ReportPollJob.locked_until < now))
+            .values(locked_until=until)
+        )
+        if res.rowcount:
+            db.commit()
+            return True
+        exists = db.execute(
+            select(models.ReportPollJob.id).where(models.ReportPollJob.file_id == file_id)
+        ).first()
+        if exists:
+            db.rollback()
+            return False
+        db.add(models.ReportPollJob(file_id=file_id, status="idle", attempts=0, next_run_at=now, locked_until=until))
+        try:
+            db.commit()
+        except Exception:
+            # Lost the insert race to another process
+            db.rollback()
+            return False
+        return True
+    finally:
+        db.close()
+
+
+def release_file(file_id: int, found: bool, error: str | None = None, requeue: bool = True) -> None:
+    """Release an inline poll's lease.
+
+    With `requeue`, unfinished files stay queued for the worker pool; otherwise (one-shot checks)
+    the job is left as it was, so a quick check doesn't start a background poll.
+    """
+    db = SessionLocal()
+    try:
+        job = db.execute(
+            select(models.ReportPollJob).where(models.ReportPollJob.file_id == file_id)
+        ).scalar_one_or_none()
+        if job is not None:
+            if found or requeue:
+                _settle(job, found, error)
+            else:
+                job.locked_until = None
+                job.last_error = error
+            db.commit()
+    finally:
+        db.close()
+
+
+def _has_report_pdf(file_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(models.Report.id)
+            .where(models.Report.file_id == file_id)
+            .where(models.Report.pdf_url.is_not(None))
+        ).first() is not None
+    finally:
+        db.close()
+
+
+async def wait_for_report(file_id: int, timeout: float) -> bool:
+    """Wait (up to `timeout`) for the file's report PDF to be stored.
+
+    Relies on the report event, which every process relays from Postgres NOTIFY. The row is only
+    checked (in a worker thread) when the wait starts and once more at the deadline, in case the
+    event was missed while the LISTEN connection was down.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    with events.subscribe(events.file_topic(file_id)) as queue:
+        # Subscribed first, so a PDF stored between this check and the wait still wakes us
+        if await asyncio.to_thread(_has_report_pdf, file_id):
+            return True
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if event.get("type") == "report" and event.get("pdf_url"):
+                return True
+    return await asyncio.to_thread(_has_report_pdf, file_id)
+
+
+async def _poll(file_id: int, max_attempts: int, delay_seconds: int, leased: bool) -> bool:
+    from ..routers.reports import poll_and_store_report_for_file
+
+    lease_seconds = max_attempts * delay_seconds + REPORT_JOB_LEASE_SECONDS
+    if not leased and not await asyncio.to_thread(lease_file, file_id, lease_seconds):
+        # Another process is polling this file: wait for its result instead of calling 5C,
+        # but no longer than this caller's own poll would have taken
+        return await wait_for_report(file_id, timeout=(max_attempts - 1) * delay_seconds + REPORT_POLL_ATTEMPT_SECONDS)
+    found, error = False, None
+    db = SessionLocal()
+    try:
+        found = bool(await poll_and_store_report_for_file(file_id, db, max_attempts=max_attempts, delay_seconds=delay_seconds))
+    except Exception as exc:
+        error = str(exc)[:1000]
+        raise
+    finally:
+        await asyncio.to_thread(db.close)
+        if not leased:
+            # Only multi-attempt polls hand unfinished files over to the worker pool
+            await asyncio.to_thread(release_file, file_id, found, error, requeue=max_attempts > 1)
+    return found
+
+
+async def run_report_poll(file_id: int, max_attempts: int = 1, delay_seconds: int = REPORT_JOB_RETRY_SECONDS, leased: bool = False) -> bool:
+    """Poll a file's report, sharing any identical poll already in flight for it. Returns True once the PDF is stored.
+
+    Callers only join polls with the same attempt budget, so a one-shot check never inherits a
+    long retry loop (or the reverse). `leased=True` means the caller already holds the file's
+    job lease (the worker pool).
+    """
+    key = (file_id, max_attempts, delay_seconds, leased)
+    return await _flights.do(key, lambda: _poll(file_id, max_attempts, delay_seconds, leased))
+
+
+def stats() -> dict:
+    return _flights.stats()
+
+
+async def _run_job(job_id: int, file_id: int) -> None:
+    found, error = False, None
+    try:
+        found = await run_report_poll(file_id, max_attempts=1, leased=True)
+    except Exception as exc:
+        error = str(exc)[:1000]
+    await asyncio.to_thread(_finish_job, job_id, found, error)
+
+
+async def _worker() -> None:
+    while True:
+        try:
+            # Claims and settles are blocking DB round trips; keep them off the event loop
+            claimed = await asyncio.to_thread(_claim_job)
+        except Exception:
+            claimed = None
+        if claimed is None:
+            await asyncio.sleep(REPORT_JOB_IDLE_SECONDS)
+            continue
+        try:
+            await _run_job(*claimed)
+        except Exception:
+            # keep the worker alive; the lease expiry makes the job eligible again
+            pass
+
+
+def start_workers() -> list[asyncio.Task]:
+    return [asyncio.create_task(_worker()) for _ in range(max(REPORT_JOB_WORKERS, 0))]
+
+
+async def stop_workers(tasks: list[asyncio.Task]) -> None:
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
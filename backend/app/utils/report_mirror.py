@@ -0,0 +1,113 @@
+"""Copy vendor report PDFs into our object storage once 5C publishes them.
+
+The vendor `pdf_url` is an external link that can expire, so as soon as a report has one the
+PDF is streamed into the E2E bucket and `Report.pdf_object_key` is recorded; clients are then
+handed short-lived presigned URLs for our copy. Mirroring is best effort: until it succeeds the
+vendor URL is served and the copy is retried on the next read.
+"""
+
+import asyncio
+import os
+
+import requests
+from sqlalchemy import update
+
+from ..database import SessionLocal
+from .. import models
+from . import object_storage
+
+REPORT_PDF_MIRROR = os.getenv("REPORT_PDF_MIRROR", "true").lower() == "true"
+REPORT_PDF_PREFIX = (os.getenv("REPORT_PDF_PREFIX") or "second-opinion/reports").strip("/")
+REPORT_PDF_URL_TTL = int(os.getenv("REPORT_PDF_URL_TTL", "3600"))
+
+_inflight: set[int] = set()
+
+
+def enabled() -> bool:
+    return REPORT_PDF_MIRROR and object_storage.is_configured()
+
+
+def object_key(report_rec: models.Report) -> str:
+    name = report_rec.report_id or f"r{report_rec.id}"
+    return f"{REPORT_PDF_PREFIX}/{report_rec.case_id}/{report_rec.file_id}/{name}.pdf"
+
+
+def _stream_to_bucket(url: str, key: str) -> None:
+    """Stream the PDF straight from the vendor response into a (multipart) upload."""
+    s3 = object_storage.get_s3_client()
+    with requests.get(url, stream=True, timeout=(10, 120)) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        s3.upload_fileobj(
+            resp.raw,
+            object_storage.bucket_name(),
+            key,
+            ExtraArgs={"ContentType": "application/pdf"},
+        )
+
+
+async def mirror_report_pdf(report_pk: int) -> str | None:
+    """Mirror one report's PDF and record its object key. Returns the key, or None if there's nothing to copy."""
+    db = SessionLocal()
+    try:
+        report_rec = db.get(models.Report, report_pk)
+        if not report_rec or not report_rec.pdf_url:
+            return None
+        if report_rec.pdf_object_key:
+            return report_rec.pdf_object_key
+        url, key = report_rec.pdf_url, object_key(report_rec)
+    finally:
+        # Don't hold a connection for the length of the transfer
+        db.close()
+
+    await asyncio.to_thread(_stream_to_bucket, url, key)
+
+    db = SessionLocal()
+    try:
+        # Only record the copy if the vendor URL hasn't changed underneath us
+        db.execute(
+            update(models.Report)
+            .where(models.Report.id == report_pk, models.Report.pdf_url == url)
+            .values(pdf_object_key=key)
+        )
+        db.commit()
+    finally:
+        db.close()
+    print(f"[report_mirror] report={report_pk} stored {key}")
+    return key
+
+
+def schedule_mirror(report_pk: int | None) -> None:
+    """Start mirroring in the background (no-op if disabled or already running here)."""
+    if report_pk is None or not enabled() or report_pk in _inflight:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _inflight.add(report_pk)
+
+    async def _run():
+        try:
+            await mirror_report_pdf(report_pk)
+        except Exception as e:
+            print(f"[report_mirror] report={report_pk} failed: {e}")
+        finally:
+            _inflight.discard(report_pk)
+
+    loop.create_task(_run())
+
+
+def report_pdf_url(report_rec: models.Report, mirror: bool = True) -> str | None:
+    """URL to hand to clients: a presigned URL for our copy, else the vendor URL (and start copying).
+
+    Pass `mirror=False` before the row is committed; the writer schedules the copy afterwards.
+    """
+    if report_rec.pdf_object_key and object_storage.is_configured():
+        try:
+            return object_storage.presign_get(report_rec.pdf_object_key, REPORT_PDF_URL_TTL)
+        except Exception as e:
+            print(f"[report_mirror] presign failed report={report_rec.id}: {e}")
+    if report_rec.pdf_url and mirror:
+        schedule_mirror(report_rec.id)
+    return report_rec.pdf_url
@@ -0,0 +1,29 @@
+"""In-process single-flight: concurrent callers for the same key share one in-flight call."""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key, fn):
+        """Await `fn()` for `key`, or join the call already in flight for it.
+
+        The call runs as its own task, so a caller being cancelled (e.g. a client disconnecting)
+        doesn't abort the work other callers are waiting on.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t, k=key: self._calls.pop(k, None))
+            self.started += 1
+        else:
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "started": self.started, "joined": self.joined}
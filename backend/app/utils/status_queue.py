@@ -0,0 +1,62 @@
+"""Scheduling helpers for the `status_checks` work queue used by the status refresher."""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .fivec_client import FIVEC_WEBHOOK_SECRET
+
+# First re-check happens after the base delay, then doubles per attempt up to the max.
+# With 5C webhooks enabled the queue is only a reconciliation fallback, so it starts slower.
+STATUS_CHECK_BASE_DELAY = int(os.getenv("STATUS_CHECK_BASE_DELAY_SECONDS", "1800" if FIVEC_WEBHOOK_SECRET else "300"))
+STATUS_CHECK_MAX_DELAY = int(os.getenv("STATUS_CHECK_MAX_DELAY_SECONDS", str(6 * 3600)))
+
+TERMINAL_STATUSES = {"completed"}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def backoff_delay(attempts: int) -> int:
+    """Seconds to wait before the next check after `attempts` unsuccessful checks."""
+    return min(STATUS_CHECK_BASE_DELAY * (2 ** max(attempts - 1, 0)), STATUS_CHECK_MAX_DELAY)
+
+
+def enqueue_status_check(db: Session, file_id: int, delay_seconds: int = 0) -> models.StatusCheck:
+    """Schedule a file for status checks (idempotent). Caller commits."""
+    check = db.execute(
+        select(models.StatusCheck).where(models.StatusCheck.file_id == file_id)
+    ).scalar_one_or_none()
+    next_at = _now() + timedelta(seconds=delay_seconds)
+    if check is None:
+        check = models.StatusCheck(file_id=file_id, attempts=0, next_check_at=next_at)
+        db.add(check)
+    elif check.next_check_at is None or check.next_check_at > next_at:
+        check.next_check_at = next_at
+    return check
+
+
+def record_check_result(db: Session, check: models.StatusCheck, vendor_status: str | None) -> None:
+    """Drop the check once the file is terminal, otherwise back off. Caller commits."""
+    if vendor_status in TERMINAL_STATUSES:
+        db.delete(check)
+        return
+    if vendor_status != check.last_vendor_status:
+        # Progress on the vendor side: restart the backoff curve
+        check.attempts = 0
+    check.attempts = (check.attempts or 0) + 1
+    check.last_vendor_status = vendor_status
+    check.next_check_at = _now() + timedelta(seconds=backoff_delay(check.attempts))
+
+
+def clear_status_check(db: Session, file_id: int) -> None:
+    """Remove a file from the queue once its status is known to be terminal. Caller commits."""
+    check = db.execute(
+        select(models.StatusCheck).where(models.StatusCheck.file_id == file_id)
+    ).scalar_one_or_none()
+    if check is not None:
+        db.delete(check)
@@ -0,0 +1,117 @@
+"""Decoding and normalized storage of structured-report PDFs.
+
+`structured_reports` is written by the opinion site, and its Text PDF columns hold base64, data
+URLs, quoted or escaped strings, or latin-1 raw bytes. The decoded bytes are kept in the
+`*_pdf_bin` BYTEA columns (filled by a trigger on write, by the backfill script for old rows and
+lazily on read), so reads are a straight byte fetch.
+"""
+
+import base64
+import codecs
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PDF_COLUMNS = ("original_report_pdf", "generated_report_pdf")
+
+_B64_RE = re.compile(r"[A-Za-z0-9+/=\r\n\s]+")
+
+
+def bin_column(field: str) -> str:
+    return f"{field}_bin"
+
+
+def b64_or_raw_to_bytes(value: str | bytes | bytearray | memoryview | None) -> bytes | None:
+    if value is None:
+        return None
+    # Direct bytes-like from DB (e.g., BYTEA -> memoryview)
+    try:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            b = bytes(value)
+            if b:
+                return b
+    except Exception:
+        pass
+    s = str(value).strip()
+    # Handle data URLs like: data:application/pdf;base64,<data>
+    if s.lower().startswith("data:application/pdf;base64,"):
+        s = s.split(",", 1)[1]
+    # Try base64 if it looks like base64
+    try:
+        # Heuristic: base64 uses only A-Z a-z 0-9 + / = and optional newlines
+        if _B64_RE.fullmatch(s):
+            decoded = base64.b64decode(s, validate=False)
+            if decoded.startswith(b"%PDF"):
+                return decoded
+            # If decoded produces bytes, still acceptable as PDF
+            if decoded:
+                return decoded
+    except Exception:
+        pass
+    # If the string itself looks like a PDF content (starts with %PDF), encode using latin-1 to preserve byte values
+    if s.startswith("%PDF"):
+        try:
+            return s.encode("latin-1", errors="ignore")
+        except Exception:
+            pass
+    # If looks like an escaped JSON string with \n, \r, etc., try unescaping
+    try:
+        unescaped = codecs.decode(s, 'unicode_escape')
+        if unescaped.startswith("%PDF"):
+            return unescaped.encode("latin-1", errors="ignore")
+    except Exception:
+        pass
+    # Fallback: try latin-1 encoding to preserve raw bytes as-is
+    try:
+        return s.encode("latin-1", errors="ignore")
+    except Exception:
+        return None
+
+
+def decode_pdf_text(payload) -> bytes | None:
+    """Decode one Text column value, retrying without surrounding quotes if needed."""
+    pdf_bytes = b64_or_raw_to_bytes(payload)
+    # If not a PDF yet but payload string begins/ends with quotes, strip and retry
+    if (not pdf_bytes or not pdf_bytes.startswith(b"%PDF")) and isinstance(payload, str):
+        sp = payload.strip()
+        if (sp.startswith('"') and sp.endswith('"')) or (sp.startswith("'") and sp.endswith("'")):
+            retry = b64_or_raw_to_bytes(sp[1:-1])
+            if retry and retry.startswith(b"%PDF"):
+                pdf_bytes = retry
+    return pdf_bytes
+
+
+def is_pdf(data: bytes | None) -> bool:
+    return bool(data) and data.startswith(b"%PDF")
+
+
+def store_pdf_bin(db: Session, report_id: int, field: str, data: bytes) -> None:
+    """Persist decoded bytes for one column unless another writer already did."""
+    if field not in PDF_COLUMNS:
+        raise ValueError(field)
+    col = bin_column(field)
+    db.execute(
+        text(f"update structured_reports set {col} = :data where id = :id and {col} is null"),
+        {"data": data, "id": report_id},
+    )
+
+
+def load_pdf_column(db: Session, report_id: int, field: str) -> tuple[bytes | None, bool]:
+    """Fetch a single PDF column of one report.
+
+    Reads the stored bytes, and the Text value only when no bytes exist, so at most one blob
+    crosses the wire. Returns (pdf bytes, decoded_from_text).
+    """
+    if field not in PDF_COLUMNS:
+        raise ValueError(field)
+    col = bin_column(field)
+    row = db.execute(
+        text(f"select {col} as data, case when {col} is null then {field} end as raw from structured_reports where id = :id"),
+        {"id": report_id},
+    ).mappings().first()
+    if not row:
+        return None, False
+    if row["data"] is not None:
+        return bytes(row["data"]), False
+    return decode_pdf_text(row["raw"]), True
@@ -0,0 +1,116 @@
+"""Cached StudyIUID -> 5C study_id resolution.
+
+Many DICOM instances share one study, and the refresher, `/files/{id}/refresh-status` and the
+report pollers all resolve the same UIDs. A bounded LRU with TTL (plus short-lived negative
+entries for 404s) means each study's id is fetched from 5C once; concurrent misses for the same
+UID share a single vendor call.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from . import fivec_client
+from .fivec_client import API_BASE
+
+STUDY_CACHE_MAX_ENTRIES = int(os.getenv("STUDY_CACHE_MAX_ENTRIES", "10000"))
+STUDY_CACHE_TTL_SECONDS = int(os.getenv("STUDY_CACHE_TTL_SECONDS", "86400"))
+STUDY_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("STUDY_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+
+_MISS = object()
+
+
+class TTLCache:
+    """Size-bounded LRU whose entries also expire after a per-entry TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(max_entries, 1)
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return _MISS
+        self._data.move_to_end(key)
+        if entry[1] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+        }
+
+
+_cache = TTLCache(STUDY_CACHE_MAX_ENTRIES)
+_inflight: dict[str, asyncio.Future] = {}
+
+
+async def _fetch_study_id(study_iuid: str) -> str | None:
+    code, data = await fivec_client.get_json(f"{API_BASE}/study/uid/{study_iuid}")
+    if code == 200 and isinstance(data, dict):
+        sid = data.get("id") or data.get("study_id")
+        if sid:
+            _cache.set(study_iuid, str(sid), STUDY_CACHE_TTL_SECONDS)
+            return str(sid)
+    if code in (200, 404):
+        # Not known to 5C (yet): remember briefly so bursts don't re-ask
+        _cache.set(study_iuid, None, STUDY_CACHE_NEGATIVE_TTL_SECONDS)
+    return None
+
+
+async def resolve_study_id(study_iuid: str) -> str | None:
+    """Return the 5C study_id for a StudyIUID, or None if 5C doesn't know it."""
+    cached = _cache.get(study_iuid)
+    if cached is not _MISS:
+        return cached
+    fut = _inflight.get(study_iuid)
+    if fut is not None:
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                # The caller doing the lookup was cancelled; try again ourselves
+                return await resolve_study_id(study_iuid)
+            raise
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[study_iuid] = fut
+    try:
+        sid = await _fetch_study_id(study_iuid)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as exc:
+        fut.set_exception(exc)
+        # Mark retrieved so an unawaited failure doesn't warn
+        fut.exception()
+        raise
+    else:
+        fut.set_result(sid)
+        return sid
+    finally:
+        _inflight.pop(study_iuid, None)
+
+
+def stats() -> dict:
+    return _cache.stats()
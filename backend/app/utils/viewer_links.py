@@ -0,0 +1,141 @@
+"""Per-study 5C viewer links, generated once and served from cache.
+
+A sharable image link is requested from 5C when a StudyIUID is first recorded (upload) or on the
+first viewer open, stored in `viewer_links` with its expiry and kept in an in-process TTL cache,
+so opening the viewer normally costs no vendor call. Links are renewed shortly before expiry.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..database import SessionLocal
+from .. import models
+from . import fivec_client
+from .fivec_client import API_BASE, API_AUTH
+from .json_extract import KeyExtractor
+from .single_flight import SingleFlight
+from .study_cache import TTLCache, _MISS
+
+VIEWER_LINK_TTL_SECONDS = int(os.getenv("VIEWER_LINK_TTL_SECONDS", str(24 * 3600)))
+VIEWER_LINK_REFRESH_MARGIN_SECONDS = int(os.getenv("VIEWER_LINK_REFRESH_MARGIN_SECONDS", "600"))
+VIEWER_LINK_CACHE_MAX_ENTRIES = int(os.getenv("VIEWER_LINK_CACHE_MAX_ENTRIES", "10000"))
+
+_link_fields = KeyExtractor({
+    "link": ["url", "link", "sharable_link", "viewer_url"],
+    "expires_at": ["expires_at", "expiry", "expire_at", "expiresAt"],
+    "expires_in": ["expires_in", "expiresIn", "ttl"],
+})
+
+_cache = TTLCache(VIEWER_LINK_CACHE_MAX_ENTRIES)
+_flights = SingleFlight()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expiry(fields: dict) -> datetime:
+    default = _now() + timedelta(seconds=VIEWER_LINK_TTL_SECONDS)
+    if fields["expires_in"] is not None:
+        try:
+            return _now() + timedelta(seconds=int(fields["expires_in"]))
+        except (TypeError, ValueError):
+            pass
+    if fields["expires_at"]:
+        try:
+            parsed = datetime.fromisoformat(str(fields["expires_at"]).replace("Z", "+00:00"))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return default
+
+
+def _usable_for(expires_at: datetime | None) -> float:
+    """Seconds the link can still be handed out (0 if it's due for renewal)."""
+    if expires_at is None:
+        return 0
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return max((expires_at - _now()).total_seconds() - VIEWER_LINK_REFRESH_MARGIN_SECONDS, 0)
+
+
+def _load(study_iuid: str) -> tuple[str, datetime] | None:
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(models.ViewerLink.link, models.ViewerLink.expires_at)
+            .where(models.ViewerLink.study_iuid == study_iuid)
+        ).first()
+    finally:
+        db.close()
+    return (row.link, row.expires_at) if row else None
+
+
+def _store(study_iuid: str, link: str, expires_at: datetime) -> None:
+    db = SessionLocal()
+    try:
+        insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(models.ViewerLink.__table__).values(study_iuid=study_iuid, link=link, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["study_iuid"],
+            set_={"link": stmt.excluded.link, "expires_at": stmt.excluded.expires_at},
+        )
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _generate(study_iuid: str) -> str | None:
+    code, data = await fivec_client.get_json(f"{API_BASE}/dicom/v2/sharable-image-link", params={"study_iuid": study_iuid})
+    if code != 200 or not data:
+        print(f"[viewer_links] {study_iuid}: vendor returned {code}")
+        return None
+    fields = _link_fields.extract(data) if isinstance(data, (dict, list)) else {"link": data, "expires_at": None, "expires_in": None}
+    link = fields["link"]
+    if not isinstance(link, str) or not link:
+        return None
+    expires_at = _expiry(fields)
+    await asyncio.to_thread(_store, study_iuid, link, expires_at)
+    ttl = _usable_for(expires_at)
+    if ttl > 0:
+        _cache.set(study_iuid, link, ttl)
+    return link
+
+
+async def _resolve(study_iuid: str) -> str | None:
+    # Blocking DB round trips run in a worker thread, off the event loop
+    stored = await asyncio.to_thread(_load, study_iuid)
+    if stored:
+        ttl = _usable_for(stored[1])
+        if ttl > 0:
+            _cache.set(study_iuid, stored[0], ttl)
+            return stored[0]
+    return await _generate(study_iuid)
+
+
+async def get_viewer_link(study_iuid: str) -> str | None:
+    """Viewer link for a study: memory cache, then DB, then one (shared) vendor call."""
+    cached = _cache.get(study_iuid)
+    if cached is not _MISS and cached:
+        return cached
+    return await _flights.do(study_iuid, lambda: _resolve(study_iuid))
+
+
+async def prefetch(study_iuid: str | None) -> None:
+    """Generate and store a study's link ahead of the first viewer open (best effort)."""
+    if not study_iuid or not API_AUTH:
+        return
+    try:
+        await get_viewer_link(study_iuid)
+    except Exception as e:
+        print(f"[viewer_links] prefetch failed for {study_iuid}: {e}")
+
+
+def stats() -> dict:
+    return {**_cache.stats(), **{f"flights_{k}": v for k, v in _flights.stats().items()}}
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Backfill structured_reports.*_pdf_bin from the legacy Text PDF columns.
+
+Walks the table in id order in small batches, committing after each batch, so it can be stopped
+and re-run at any time (rows already normalized are skipped). Run after
+migrations/add_structured_report_pdf_bin.sql:
+
+    python backfill_structured_pdfs.py --batch-size 50
+    python backfill_structured_pdfs.py --start-id 120000 --drop-text
+
+--drop-text clears a Text column once its bytes are stored, reclaiming the base64 overhead
+(run VACUUM FULL / pg_repack afterwards to return the space to the OS).
+"""
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.utils.structured_pdf import PDF_COLUMNS, bin_column, decode_pdf_text, is_pdf  # noqa: E402
+
+
+def backfill_batch(db, after_id: int, batch_size: int, drop_text: bool) -> tuple[int | None, int, int]:
+    """Normalize one batch with id > after_id. Returns (last id, rows scanned, columns stored)."""
+    pending = " or ".join(f"({bin_column(f)} is null and {f} is not null)" for f in PDF_COLUMNS)
+    if drop_text:
+        pending += " or " + " or ".join(f"({bin_column(f)} is not null and {f} is not null)" for f in PDF_COLUMNS)
+    rows = db.execute(text(
+        f"""
+        select id, {", ".join(PDF_COLUMNS)}, {", ".join(f"{bin_column(f)} is not null as has_{f}" for f in PDF_COLUMNS)}
+        from structured_reports
+        where id > :after and ({pending})
+        order by id
+        limit :n
+        """
+    ), {"after": after_id, "n": batch_size}).mappings().all()
+    if not rows:
+        return None, 0, 0
+    stored = 0
+    for row in rows:
+        for field in PDF_COLUMNS:
+            has_bin = row[f"has_{field}"]
+            if not has_bin and row[field] is not None:
+                data = decode_pdf_text(row[field])
+                if is_pdf(data):
+                    db.execute(
+                        text(f"update structured_reports set {bin_column(field)} = :data where id = :id"),
+                        {"data": data, "id": row["id"]},
+                    )
+                    stored += 1
+                    has_bin = True
+                else:
+                    print(f"[backfill] id={row['id']} {field}: not a decodable PDF, left as text")
+            if drop_text and has_bin and row[field] is not None:
+                db.execute(text(f"update structured_reports set {field} = null where id = :id"), {"id": row["id"]})
+    db.commit()
+    return rows[-1]["id"], len(rows), stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize structured report PDFs into BYTEA columns")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--start-id", type=int, default=0, help="resume after this report id")
+    parser.add_argument("--sleep", type=float, default=0.0, help="pause between batches (seconds)")
+    parser.add_argument("--drop-text", action="store_true", help="clear Text columns once bytes are stored")
+    args = parser.parse_args()
+
+    after = args.start_id
+    total_rows = total_stored = 0
+    while True:
+        db = SessionLocal()
+        try:
+            last_id, scanned, stored = backfill_batch(db, after, args.batch_size, args.drop_text)
+        finally:
+            db.close()
+        if last_id is None:
+            break
+        after = last_id
+        total_rows += scanned
+        total_stored += stored
+        print(f"[backfill] up to id={after} rows={total_rows} stored={total_stored}")
+        if args.sleep:
+            time.sleep(args.sleep)
+    print(f"[backfill] done rows={total_rows} stored={total_stored}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-key recursive `_extract` vs the single-pass KeyExtractor.
+
+Builds large nested vendor-style payloads (report details lists, webhook batches, upload
+responses) with the wanted keys deep inside or absent, checks both approaches agree, and
+reports the time per call for each. Run from backend/:
+
+    python benchmarks/bench_json_extract.py
+    python benchmarks/bench_json_extract.py --items 5000 --number 20
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.json_extract import KeyExtractor  # noqa: E402
+
+GROUPS = {
+    "pdf_url": ["pdf_url", "s3_url", "url", "fileUrl", "location"],
+    "uploaded_at": ["completed_date", "created_at", "updated_at", "updatedAt"],
+    "study_iuid": ["study_iuid", "study_uid", "studyInstanceUID", "StudyInstanceUID"],
+    "study_id": ["study_id", "study_fk"],
+}
+
+
+def legacy_extract(value, keys):
+    """The previous reports._extract, one full recursive scan per alias list."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        for k in keys:
+            if k in value:
+                return value[k]
+        for v in value.values():
+            res = legacy_extract(v, keys)
+            if res is not None:
+                return res
+    if isinstance(value, list):
+        for item in value:
+            res = legacy_extract(item, keys)
+            if res is not None:
+                return res
+    return None
+
+
+def _noise(rng: random.Random, depth: int) -> dict:
+    node = {f"field_{i}": rng.choice(["x" * 16, 42, True, None]) for i in range(12)}
+    if depth > 0:
+        node["meta"] = _noise(rng, depth - 1)
+        node["series"] = [_noise(rng, depth - 1) for _ in range(2)]
+    return node
+
+
+def details_payload(rng: random.Random, items: int) -> dict:
+    """Report-details style: many items, wanted keys only in the last one, deeply nested."""
+    data = [_noise(rng, 2) for _ in range(items)]
+    data[-1]["report"] = {"files": [{"pdf": {"pdf_url": "https://example.com/r.pdf"}}], "completed_date": "2026-10-18T10:00:00Z"}
+    return {"status": "ok", "data": {"data": data}}
+
+
+def upload_payload(rng: random.Random, items: int) -> dict:
+    """Upload style: study ids present, no pdf url or timestamps anywhere (worst case for per-key scans)."""
+    instances = [_noise(rng, 1) for _ in range(items)]
+    return {"result": {"instances": instances, "study": {"StudyInstanceUID": "1.2.3", "study_fk": 7}}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    extractor = KeyExtractor(GROUPS)
+    payloads = {
+        "details": details_payload(rng, args.items),
+        "upload": upload_payload(rng, args.items),
+    }
+
+    print(f"{'payload':<10} {'per-key _extract':>18} {'KeyExtractor':>14} {'speedup':>8}")
+    for name, payload in payloads.items():
+        expected = {g: legacy_extract(payload, keys) for g, keys in GROUPS.items()}
+        assert extractor.extract(payload) == expected, name
+
+        legacy = min(timeit.repeat(lambda: [legacy_extract(payload, k) for k in GROUPS.values()], number=args.number, repeat=3))
+        single = min(timeit.repeat(lambda: extractor.extract(payload), number=args.number, repeat=3))
+        legacy_ms = legacy / args.number * 1000
+        single_ms = single / args.number * 1000
+        print(f"{name:<10} {legacy_ms:>15.2f} ms {single_ms:>11.2f} ms {legacy_ms / single_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+-- Benchmark: latest structured report per patient (GET /reports/latest)
+--
+-- Builds a 1M-row copy of structured_reports (200k patients, ~4 KB base64 PDF payloads) and
+-- shows the plan and timing of the endpoint's query before and after
+-- migrations/add_structured_reports_latest_index.sql. patient_id is INTEGER by default (the
+-- model's layout); pass -v patient_type=text for deployments where the opinion site owns the
+-- table. Run against a scratch database:
+--
+--     psql "$BENCH_DATABASE_URL" -f benchmarks/structured_reports_latest.sql
+--     psql "$BENCH_DATABASE_URL" -v patient_type=text -f benchmarks/structured_reports_latest.sql
+--
+-- Measured on PostgreSQL 16.2, default settings, cold cache after the load:
+--
+-- patient_id INTEGER, before (532 ms, 111k buffers):
+--   Limit -> Gather Merge -> Sort (created_at DESC)
+--     -> Parallel Seq Scan on bench_structured_reports
+--          Filter: ((patient_id)::text = '4242'::text), Rows Removed by Filter: 333332 (x3)
+--          Buffers: shared hit=15773 read=95339
+-- patient_id INTEGER, after (0.062 ms, 4 buffers):
+--   Limit -> Index Scan using bench_sr_patient_text_created
+--          Index Cond: ((patient_id)::text = '4242'::text)
+--
+-- patient_id TEXT, before (0.149 ms, 9 buffers): the cast is a no-op, so the plain index applies
+--   Limit -> Sort (top-N heapsort) -> Index Scan using bench_sr_patient_id (rows=6)
+-- patient_id TEXT, after (0.066 ms, 4 buffers): same probe without the sort
+--   Limit -> Index Scan using bench_sr_patient_text_created (rows=1)
+
+\if :{?patient_type}
+\else
+    \set patient_type integer
+\endif
+\timing on
+
+DROP TABLE IF EXISTS bench_structured_reports;
+CREATE TABLE bench_structured_reports (
+    id SERIAL PRIMARY KEY,
+    patient_id :patient_type NOT NULL,
+    status VARCHAR,
+    structured TEXT,
+    original_report_pdf TEXT,
+    generated_report_pdf TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 1M reports across 200k patients, spread over two years
+INSERT INTO bench_structured_reports (patient_id, status, structured, original_report_pdf, generated_report_pdf, created_at)
+SELECT
+    (1 + (random() * 199999)::int)::text:::patient_type,
+    'completed',
+    '{"findings": "bench"}',
+    encode(convert_to(repeat(md5(g::text), 96), 'UTF8'), 'base64'),
+    encode(convert_to(repeat(md5((g + 1)::text), 96), 'UTF8'), 'base64'),
+    now() - (random() * interval '730 days')
+FROM generate_series(1, 1000000) AS g;
+
+-- Same index the model already declares on patient_id; unusable for the cast comparison when
+-- the column is INTEGER
+CREATE INDEX bench_sr_patient_id ON bench_structured_reports (patient_id);
+ANALYZE bench_structured_reports;
+
+\echo '--- before: endpoint query without the expression index'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, status FROM bench_structured_reports
+WHERE cast(patient_id as text) = '4242'
+ORDER BY created_at DESC
+LIMIT 1;
+
+CREATE INDEX bench_sr_patient_text_created
+    ON bench_structured_reports ((CAST(patient_id AS TEXT)), created_at DESC);
+ANALYZE bench_structured_reports;
+
+\echo '--- after: expression index on (patient_id::text, created_at desc)'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, status FROM bench_structured_reports
+WHERE cast(patient_id as text) = '4242'
+ORDER BY created_at DESC
+LIMIT 1;
+
+DROP TABLE bench_structured_reports;
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Local fake 5C sender for the report webhook (POST /fivec/webhook).
+
+Signs a report-completed event with FIVEC_WEBHOOK_SECRET the same way the endpoint verifies it,
+so webhook ingestion can be exercised against a local backend without the vendor.
+
+    python fivec_webhook_sender.py --study-iuid 1.2.840... --pdf-url https://example.com/r.pdf
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a signed fake 5C report event")
+    parser.add_argument("--url", default="http://localhost:8000/fivec/webhook")
+    parser.add_argument("--secret", default=os.getenv("FIVEC_WEBHOOK_SECRET"))
+    parser.add_argument("--study-iuid")
+    parser.add_argument("--study-id")
+    parser.add_argument("--report-id", default="1")
+    parser.add_argument("--pdf-url")
+    parser.add_argument("--status", default="COMPLETED")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("--secret or FIVEC_WEBHOOK_SECRET is required")
+    if not args.study_iuid and not args.study_id:
+        parser.error("--study-iuid or --study-id is required")
+
+    event = {
+        "event": "report.completed",
+        "data": {
+            "id": args.report_id,
+            "study_iuid": args.study_iuid,
+            "study_id": args.study_id,
+            "status": args.status,
+            "pdf_url": args.pdf_url,
+        },
+    }
+    body = json.dumps(event).encode()
+    signature = hmac.new(args.secret.encode(), body, hashlib.sha256).hexdigest()
+    resp = requests.post(
+        args.url,
+        data=body,
+        headers={"Content-Type": "application/json", "X-5C-Signature": signature},
+        timeout=10,
+    )
+    print(f"{resp.status_code} {resp.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+-- Migration: Index files by (study_iuid, user_id)
+-- Date: 2026-10-18
+-- Description: Serves the ownership check of GET /reports/viewer-link
+-- (files.study_iuid = ? AND files.user_id = ?), which runs on every viewer click.
+--
+-- CONCURRENTLY avoids blocking uploads while the index builds; run this file outside a
+-- transaction block (e.g. psql without --single-transaction). If the build fails it leaves an
+-- INVALID index: drop it and run the file again.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_study_iuid_user_id ON files (study_iuid, user_id);
@@ -0,0 +1,7 @@
+-- Migration: Add pdf_object_key to reports
+-- Date: 2026-10-18
+-- Description: Vendor report PDFs are now copied into the E2E bucket once 5C publishes pdf_url.
+-- pdf_object_key records our copy; /reports/{file_id}/pdf serves presigned URLs for it and
+-- falls back to the vendor pdf_url while the copy is missing.
+
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS pdf_object_key VARCHAR;
@@ -0,0 +1,20 @@
+-- Migration: Add report_poll_jobs table
+-- Date: 2026-10-18
+-- Description: Report polling after an upload used to run as a fire-and-forget asyncio task
+-- that died on restart. Each poll is now a persisted job (one per file) claimed by the
+-- in-process worker pool with a lease, retried with a delay, and resumed after restarts.
+
+CREATE TABLE IF NOT EXISTS report_poll_jobs (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL UNIQUE REFERENCES files(id) ON DELETE CASCADE,
+    status VARCHAR NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_report_poll_jobs_id ON report_poll_jobs (id);
+CREATE INDEX IF NOT EXISTS ix_report_poll_jobs_next_run_at ON report_poll_jobs (next_run_at);
@@ -0,0 +1,50 @@
+-- Migration: Make reports.file_id unique
+-- Date: 2026-10-18
+-- Description: Reports are now written with INSERT ... ON CONFLICT (file_id) DO UPDATE, one
+-- statement per vendor details batch. Concurrent pollers could previously insert several rows
+-- for the same file; keep one per file (prefer a row with a PDF, then the newest) and fill its
+-- missing fields from the duplicates, then add the unique constraint.
+
+BEGIN;
+
+LOCK TABLE reports IN SHARE ROW EXCLUSIVE MODE;
+
+WITH ranked AS (
+    SELECT id, file_id,
+           row_number() OVER (PARTITION BY file_id ORDER BY (pdf_url IS NOT NULL) DESC, id DESC) AS rn
+    FROM reports
+    WHERE file_id IS NOT NULL
+),
+filled AS (
+    SELECT k.id,
+           (array_agg(r.report_id ORDER BY r.id DESC) FILTER (WHERE r.report_id IS NOT NULL))[1] AS report_id,
+           (array_agg(r.radiologist_id ORDER BY r.id DESC) FILTER (WHERE r.radiologist_id IS NOT NULL))[1] AS radiologist_id,
+           (array_agg(r.uploaded_at ORDER BY r.id DESC) FILTER (WHERE r.uploaded_at IS NOT NULL))[1] AS uploaded_at
+    FROM ranked k
+    JOIN reports r ON r.file_id = k.file_id
+    WHERE k.rn = 1
+    GROUP BY k.id
+)
+UPDATE reports t
+SET report_id = COALESCE(t.report_id, f.report_id),
+    radiologist_id = COALESCE(t.radiologist_id, f.radiologist_id),
+    uploaded_at = COALESCE(t.uploaded_at, f.uploaded_at)
+FROM filled f
+WHERE t.id = f.id;
+
+DELETE FROM reports r
+USING (
+    SELECT id, row_number() OVER (PARTITION BY file_id ORDER BY (pdf_url IS NOT NULL) DESC, id DESC) AS rn
+    FROM reports
+    WHERE file_id IS NOT NULL
+) d
+WHERE r.id = d.id AND d.rn > 1;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'reports_file_id_key') THEN
+        ALTER TABLE reports ADD CONSTRAINT reports_file_id_key UNIQUE (file_id);
+    END IF;
+END $$;
+
+COMMIT;
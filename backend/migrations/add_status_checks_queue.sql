@@ -0,0 +1,25 @@
+-- Migration: Add status_checks work queue for the background status refresher
+-- Date: 2026-10-18
+-- Description: The refresher used to re-query every file with a study_iuid on each cycle.
+-- It now only processes rows in status_checks whose next_check_at is due; rows are removed
+-- once the file reaches a terminal status and back off exponentially otherwise.
+
+CREATE TABLE IF NOT EXISTS status_checks (
+    id SERIAL PRIMARY KEY,
+    file_id INTEGER NOT NULL UNIQUE REFERENCES files(id) ON DELETE CASCADE,
+    next_check_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_vendor_status VARCHAR,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_status_checks_id ON status_checks (id);
+CREATE INDEX IF NOT EXISTS ix_status_checks_next_check_at ON status_checks (next_check_at);
+
+-- Seed the queue with files that are still waiting on a report
+INSERT INTO status_checks (file_id, next_check_at, attempts)
+SELECT id, now(), 0
+FROM files
+WHERE study_iuid IS NOT NULL
+  AND status IS DISTINCT FROM 'completed'
+ON CONFLICT (file_id) DO NOTHING;
@@ -0,0 +1,61 @@
+-- Migration: Add normalized binary PDF columns to structured_reports
+-- Date: 2026-10-18
+-- Description: original_report_pdf / generated_report_pdf are Text columns holding base64, data
+-- URLs, quoted strings or raw latin-1 bytes, decoded on every read. Decoded bytes now live in
+-- *_pdf_bin BYTEA columns. The trigger fills them on write for base64 / data URL payloads; older
+-- rows are filled by backfill_structured_pdfs.py, and anything the trigger cannot decode is
+-- written back by the API on first read.
+
+ALTER TABLE structured_reports ADD COLUMN IF NOT EXISTS original_report_pdf_bin BYTEA;
+ALTER TABLE structured_reports ADD COLUMN IF NOT EXISTS generated_report_pdf_bin BYTEA;
+
+CREATE OR REPLACE FUNCTION structured_report_pdf_decode(v TEXT) RETURNS BYTEA AS $$
+DECLARE
+    s TEXT;
+    b BYTEA;
+BEGIN
+    IF v IS NULL THEN
+        RETURN NULL;
+    END IF;
+    s := btrim(v, E' \t\r\n"''');
+    IF lower(left(s, 28)) = 'data:application/pdf;base64,' THEN
+        s := substr(s, 29);
+    END IF;
+    BEGIN
+        b := decode(regexp_replace(s, '\s', '', 'g'), 'base64');
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    -- Only keep real PDFs; other encodings are left to the application decoder
+    IF substring(b FROM 1 FOR 4) = '\x25504446'::bytea THEN
+        RETURN b;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION structured_reports_fill_pdf_bin() RETURNS trigger AS $$
+BEGIN
+    -- Changed text replaces stale bytes; text set to NULL (backfill --drop-text) keeps them
+    IF NEW.original_report_pdf IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.original_report_pdf IS DISTINCT FROM OLD.original_report_pdf) THEN
+        NEW.original_report_pdf_bin := COALESCE(
+            structured_report_pdf_decode(NEW.original_report_pdf),
+            CASE WHEN TG_OP = 'INSERT' THEN NEW.original_report_pdf_bin END
+        );
+    END IF;
+    IF NEW.generated_report_pdf IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.generated_report_pdf IS DISTINCT FROM OLD.generated_report_pdf) THEN
+        NEW.generated_report_pdf_bin := COALESCE(
+            structured_report_pdf_decode(NEW.generated_report_pdf),
+            CASE WHEN TG_OP = 'INSERT' THEN NEW.generated_report_pdf_bin END
+        );
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_structured_reports_fill_pdf_bin ON structured_reports;
+CREATE TRIGGER trg_structured_reports_fill_pdf_bin
+    BEFORE INSERT OR UPDATE OF original_report_pdf, generated_report_pdf ON structured_reports
+    FOR EACH ROW EXECUTE FUNCTION structured_reports_fill_pdf_bin();
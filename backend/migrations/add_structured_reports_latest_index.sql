@@ -0,0 +1,20 @@
+-- Migration: Index the latest-structured-report lookup
+-- Date: 2026-10-18
+-- Description: GET /reports/latest filters on cast(patient_id as text) (the column is TEXT on some
+-- deployments, written by the opinion site) and orders by created_at desc. On the model's INTEGER
+-- column the cast defeats the plain patient_id index, so every call was a sequential scan of the
+-- blob-heavy table (~530 ms at 1M rows); on TEXT columns it still sorted all of the patient's
+-- rows. This expression index matches the query exactly, whatever the column type, and serves
+-- "order by created_at desc limit 1" with a single index probe. The created_at index backs the
+-- demo fallback (latest report overall).
+--
+-- CONCURRENTLY avoids blocking writers; run these statements outside a transaction block.
+-- Benchmark: benchmarks/structured_reports_latest.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_structured_reports_patient_text_created
+    ON structured_reports ((CAST(patient_id AS TEXT)), created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_structured_reports_created_at
+    ON structured_reports (created_at DESC);
+
+ANALYZE structured_reports;
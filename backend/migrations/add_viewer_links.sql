@@ -0,0 +1,16 @@
+-- Migration: Add viewer_links table
+-- Date: 2026-10-18
+-- Description: GET /reports/viewer-link called 5C's sharable-image-link API on every click.
+-- Links are now generated once per study (eagerly after upload), stored here with their expiry
+-- and renewed shortly before it. The endpoint's ownership check is indexed separately by
+-- add_files_study_iuid_user_id_index.sql.
+
+CREATE TABLE IF NOT EXISTS viewer_links (
+    id SERIAL PRIMARY KEY,
+    study_iuid VARCHAR NOT NULL UNIQUE,
+    link TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_viewer_links_id ON viewer_links (id);